@@ -0,0 +1,299 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from docx import Document
+
+from main import (ParagraphCache, UltimateTextHumanizer, process_word_document,
+                  stream_word_document)
+
+# Techniques humanize_text chains, benchmarked one at a time
+TECHNIQUES = [
+    'replace_ai_patterns',
+    'add_contractions',
+    'vary_sentence_flow',
+    'add_human_speech_patterns',
+    'introduce_natural_imperfections',
+    'adjust_formality_level',
+    'add_personal_touches',
+]
+
+SUBJECTS = ['the team', 'our platform', 'this approach', 'the new policy', 'each department',
+            'the quarterly report', 'the proposed framework', 'our stakeholders', 'the system']
+NOUNS = ['workflow', 'roadmap', 'initiative', 'deliverables', 'infrastructure', 'outcomes',
+         'strategy', 'customer experience', 'pipeline', 'metrics']
+VERBS = ['improve', 'streamline', 'support', 'deliver', 'accelerate', 'strengthen', 'align']
+# Sentences in each paragraph of the long_paragraph benchmark, where a
+# technique whose cost grows with edits times sentences shows up
+LONG_PARAGRAPH_SENTENCES = 4000
+
+# Result fields compared against the baseline: field -> (unit, higher is better)
+COMPARED = {
+    'paragraphs_per_sec': ('paragraphs/sec', True),
+    'cold_start_ms': ('ms cold start', False),
+    'peak_rss_kb': ('KB peak RSS', False),
+}
+
+# Run in a fresh interpreter: import the humanizer and humanize one string
+COLD_START = """
+import sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.UltimateTextHumanizer().humanize_text(sys.argv[1])
+print(imported - started, len(sys.modules))
+"""
+
+def rule_phrase(pattern):
+    """Literal text of an r'\\bphrase\\b' rule"""
+    return pattern[2:-2].replace("\\'", "'")
+
+class CorpusGenerator:
+    """Seeded generator of AI-style text dense in the humanizer's triggers"""
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        humanizer = UltimateTextHumanizer()
+        phrases = [rule_phrase(pattern) for pattern in humanizer.ai_patterns]
+        self.transitions = [p for p in phrases if p[0].isupper()]
+        self.jargon = [p for p in phrases if p[0].islower()]
+        self.contractions = [rule_phrase(pattern) for pattern in humanizer.contractions]
+        self.formal = [rule_phrase(pattern) for pattern in humanizer.formal_to_casual]
+
+    def sentence(self):
+        rng = self.rng
+        words = []
+        if rng.random() < 0.5:
+            words.append(rng.choice(self.transitions) + ',')
+        words.append(rng.choice(SUBJECTS))
+        words.append(rng.choice(self.contractions) if rng.random() < 0.7 else 'is')
+        words += [rng.choice(['able to', 'going to', 'set to']), rng.choice(self.jargon),
+                  'the', rng.choice(NOUNS), 'to', rng.choice(VERBS), 'the', rng.choice(NOUNS)]
+        if rng.random() < 0.4:
+            words += ['for', 'every', rng.choice(self.formal)]
+        sentence = ' '.join(words)
+        return sentence[0].upper() + sentence[1:] + '.'
+
+    def paragraph(self):
+        return ' '.join(self.sentence() for _ in range(self.rng.randint(3, 7)))
+
+    def paragraphs(self, count):
+        return [self.paragraph() for _ in range(count)]
+
+    def long_paragraph(self, sentences=LONG_PARAGRAPH_SENTENCES):
+        return ' '.join(self.sentence() for _ in range(sentences))
+
+    def document(self, path, count):
+        """Plain .docx with count paragraphs"""
+        doc = Document()
+        for text in self.paragraphs(count):
+            doc.add_paragraph(text)
+        doc.save(path)
+
+    def table_document(self, path, count, cols=4):
+        """Table-heavy .docx holding count paragraphs, mostly in table cells"""
+        doc = Document()
+        remaining = count
+        while remaining > 0:
+            doc.add_paragraph(self.paragraph())
+            rows = max(1, min(10, (remaining - 1) // cols))
+            table = doc.add_table(rows=rows, cols=cols)
+            for cell in table._cells:
+                cell.text = self.sentence()
+            remaining -= 1 + rows * cols
+        doc.save(path)
+
+def measure(texts, run):
+    """Time run() over texts and describe the throughput"""
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    return {
+        'paragraphs': len(texts),
+        'bytes': size,
+        'seconds': round(seconds, 4),
+        'paragraphs_per_sec': round(len(texts) / seconds, 1),
+        'mb_per_sec': round(size / seconds / 1e6, 3),
+    }
+
+def measure_cold_start(text, runs=10):
+    """Median time for a new interpreter to import main and humanize text"""
+    totals, imports = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START, text], check=True,
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        totals.append(time.perf_counter() - started)
+        import_seconds, modules = output.split()
+        imports.append(float(import_seconds))
+    
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        'cold_start_ms': round(statistics.median(totals) * 1000, 1),
+        'import_ms': round(statistics.median(imports) * 1000, 1),
+        'modules': int(modules),
+        'peak_rss_kb': peak // 1024 if sys.platform == 'darwin' else peak,
+    }
+
+def build_document(path, variant, paragraphs, seed):
+    """Write a corpus .docx and return its texts.
+
+    Runs in a helper process so the python-docx tree doesn't count towards
+    the engine's peak RSS.
+    """
+    corpus = CorpusGenerator(seed)
+    if variant == 'tables':
+        corpus.table_document(path, paragraphs)
+    else:
+        corpus.document(path, paragraphs)
+    doc = Document(path)
+    texts = [p.text for p in doc.paragraphs if p.text.strip()]
+    for table in doc.tables:
+        texts += [cell.text for cell in table._cells]
+    return texts
+
+def run_benchmark(name, paragraphs, seed):
+    """Run one named benchmark; called in a fresh process"""
+    if name == 'cold_start':
+        return measure_cold_start(CorpusGenerator(seed).paragraph())
+    
+    random.seed(seed)
+    corpus = CorpusGenerator(seed)
+    humanizer = UltimateTextHumanizer()
+
+    if name.startswith('docx:'):
+        _, variant, engine = name.split(':')
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, 'input.docx')
+            output_path = os.path.join(tmp, 'output.docx')
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                texts = executor.submit(build_document, input_path, variant, paragraphs, seed).result()
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if engine == 'stream':
+                        stream_word_document(input_path, output_path, cache=ParagraphCache(0))
+                    else:
+                        process_word_document(input_path, output_path, cache=ParagraphCache(0))
+            result = measure(texts, run)
+    else:
+        if name == 'long_paragraph':
+            texts = [corpus.long_paragraph() for _ in range(3)]
+        else:
+            texts = corpus.paragraphs(paragraphs)
+        humanizer.analyze_writing_style(' '.join(texts[:10]))
+        # Exercise the formality stage too
+        humanizer.preferences['formality'] = 'casual'
+
+        if name == 'process_paragraph':
+            doc = Document()
+            targets = [doc.add_paragraph(text) for text in texts]
+            result = measure(texts, lambda: [humanizer.process_paragraph(p) for p in targets])
+        elif name == 'long_paragraph':
+            result = measure(texts, lambda: [humanizer.humanize_text(text) for text in texts])
+        else:
+            method = getattr(humanizer, name)
+            result = measure(texts, lambda: [method(text) for text in texts])
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result['peak_rss_kb'] = peak // 1024 if sys.platform == 'darwin' else peak
+    return result
+
+def benchmark_names():
+    return (['cold_start'] + TECHNIQUES + ['humanize_text', 'long_paragraph', 'process_paragraph'] +
+            [f'docx:{variant}:{engine}' for variant in ('document', 'tables')
+             for engine in ('object', 'stream')])
+
+def run_all(paragraphs, seed, selected=None):
+    """Run each benchmark in its own process so peak RSS is its own"""
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name in benchmark_names():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = results[name] = executor.submit(run_benchmark, name, paragraphs, seed).result()
+        if name == 'cold_start':
+            print(f"   {name}: {result['cold_start_ms']} ms to the first text, "
+                  f"{result['import_ms']} ms importing {result['modules']} modules", file=sys.stderr)
+            continue
+        print(f"   {name}: {result['paragraphs_per_sec']} paragraphs/sec, "
+              f"{result['mb_per_sec']} MB/sec, {result['peak_rss_kb']} KB peak", file=sys.stderr)
+    return results
+
+def find_regressions(results, baseline, tolerance):
+    """Benchmarks slower or hungrier than the baseline by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for field, (unit, higher_is_better) in COMPARED.items():
+            if field not in result or field not in base:
+                continue
+            if higher_is_better:
+                regressed = result[field] < base[field] * (1 - tolerance)
+            else:
+                regressed = result[field] > base[field] * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}: {result[field]} {unit} (baseline {base[field]})")
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark humanizer throughput on a synthetic corpus")
+    parser.add_argument('--paragraphs', type=int, default=2000, help="corpus size per benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='*', help="run benchmarks whose names start with these")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                             'benchmark_baseline.json'),
+                        help="stored baseline to compare against (default: next to this script)")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    options = {'paragraphs': args.paragraphs, 'seed': args.seed}
+    report = {'options': options, 'results': run_all(args.paragraphs, args.seed, args.only)}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Without a baseline there is nothing to gate on, which must not pass quietly
+        print(f"❌ No baseline at {args.baseline}; record one with --save-baseline", file=sys.stderr)
+        return 2
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('options') != options:
+        print(f"⚠️  Baseline was recorded with {baseline.get('options')}, not {options}", file=sys.stderr)
+    regressions = find_regressions(report['results'], baseline.get('results', {}), args.tolerance)
+    for regression in regressions:
+        print(f"❌ Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,120 +1,724 @@
-import docx
+import bisect
+import contextlib
+import copy
+import difflib
+import functools
+import glob
+import hashlib
+import importlib
+import io
+import itertools
+import json
+import mmap
+import os
 import re
 import random
+import shutil
 import string
-from docx import Document
-from docx.shared import Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from collections import defaultdict
+import sys
+import time
+import zlib
+from collections import Counter, OrderedDict, defaultdict, deque
+from types import MappingProxyType
 
-class UltimateTextHumanizer:
-    def __init__(self):
-        # Comprehensive AI pattern replacement database
-        self.ai_patterns = {
-            # Formal to casual transitions
-            r'\bIn conclusion\b': ['To wrap up', 'All in all', 'When it comes down to it', 'At the end of the day'],
-            r'\bIt is important to note that\b': ['Keep in mind', 'Remember', 'What you should know is', 'The thing is'],
-            r'\bFurthermore\b': ['What\'s more', 'On top of that', 'Plus', 'And another thing'],
-            r'\bMoreover\b': ['Besides that', 'Also', 'Not only that', 'And let\'s not forget'],
-            r'\bHowever\b': ['But', 'That said', 'Then again', 'On the other hand'],
-            r'\bNevertheless\b': ['Still', 'Even so', 'All the same', 'Despite that'],
-            r'\bThus\b': ['So', 'This means', 'Because of this', 'As a result'],
-            r'\bHence\b': ['So', 'Therefore', 'That\'s why', 'This leads to'],
-            r'\bAdditionally\b': ['Also', 'Plus', 'Another thing', 'What\'s more'],
-            r'\bConsequently\b': ['So', 'Because of this', 'This means', 'As you might expect'],
-            r'\bAccordingly\b': ['So', 'Because of this', 'This is why', 'Given that'],
+class LazyModule:
+    """Module that is only imported when one of its attributes is first used"""
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        # Later lookups find the attributes directly
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+# Document support, process pools and the CLI are only loaded when used, so
+# importing the humanizer for plain strings stays cheap
+argparse = LazyModule('argparse')
+array = LazyModule('array')
+futures = LazyModule('concurrent.futures')
+zipfile = LazyModule('zipfile')
+docx = LazyModule('docx')
+etree = LazyModule('lxml.etree')
+np = LazyModule('numpy')
+
+class TokenDocument:
+    """Shared token array plus sentence-boundary index for all techniques"""
+    SENTENCE_END_RE = re.compile(r'[.!?]+(?=[\'")\]]*$)')
+
+    def __init__(self, text):
+        self.tokens = text.split()
+        self.reindex()
+
+    def reindex(self):
+        """Recompute sentence starts after edits that move sentence endings"""
+        self.starts = [0] if self.tokens else []
+        for i, token in enumerate(self.tokens[:-1]):
+            if self.SENTENCE_END_RE.search(token):
+                self.starts.append(i + 1)
+
+    def sentence_span(self, index):
+        """Token range (start, end) of the sentence at index"""
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else len(self.tokens)
+        return self.starts[index], end
+
+    def sentence_spans(self):
+        return [self.sentence_span(i) for i in range(len(self.starts))]
+
+    def splice(self, start, end, new_tokens):
+        """Replace tokens[start:end] in place and shift later sentence starts.
+
+        Each call walks the later starts, so techniques making an edit per
+        match or per sentence build the new tokens in one pass and replace().
+        """
+        self.tokens[start:end] = new_tokens
+        delta = len(new_tokens) - (end - start)
+        if delta:
+            for i in range(bisect.bisect_right(self.starts, start), len(self.starts)):
+                self.starts[i] += delta
+
+    def replace(self, tokens):
+        """Swap in a token list built in one pass and reindex its sentences"""
+        self.tokens[:] = tokens
+        self.reindex()
+
+    def char_length(self):
+        return sum(map(len, self.tokens)) + max(len(self.tokens) - 1, 0)
+
+    def render(self):
+        return ' '.join(self.tokens)
+
+    @classmethod
+    def split_ending(cls, token):
+        """Split a token into its body and sentence-ending punctuation"""
+        match = cls.SENTENCE_END_RE.search(token)
+        if not match:
+            return token, ''
+        return token[:match.start()] + token[match.end():], match.group(0)
+
+def document_technique(method):
+    """Let a TokenDocument technique also be called on a plain string.
+
+    The context defaults to the engine's default_context().
+    """
+    @functools.wraps(method)
+    def wrapper(self, text, ctx=None):
+        ctx = self.default_context() if ctx is None else ctx
+        if isinstance(text, TokenDocument):
+            method(self, text, ctx)
+            return text
+        doc = TokenDocument(text)
+        method(self, doc, ctx)
+        return doc.render()
+    return wrapper
+
+def lower_first(token):
+    return token[:1].lower() + token[1:]
+
+class PhraseRewriter:
+    """Single-pass whole-word matcher compiled from the replacement tables"""
+    TOKEN_RE = re.compile(r"(\W*)(\w+)(\W*)")
+
+    def __init__(self, tables):
+        # The tables themselves, for the replacements of matched patterns
+        self.tables = tables
+        # Per table: phrase -> original pattern, first word -> longest phrase
+        self.phrases = {}
+        self.max_words = {}
+        for name, patterns in tables.items():
+            if isinstance(patterns, Lexicon):
+                # Lexicons bring their own indexes with the same get() interface
+                self.phrases[name] = patterns.phrases
+                self.max_words[name] = patterns.heads
+                continue
+            phrases = self.phrases[name] = {}
+            max_words = self.max_words[name] = {}
+            for pattern in patterns:
+                words = self.phrase_words(pattern)
+                phrases[' '.join(words)] = pattern
+                max_words[words[0]] = max(max_words.get(words[0], 0), len(words))
+
+    @staticmethod
+    def phrase_words(pattern):
+        """Turn a literal r'\bsome phrase\b' rule into its lowercase words"""
+        if not (pattern.startswith(r'\b') and pattern.endswith(r'\b')):
+            raise ValueError(f"Rule {pattern!r} must be a literal \\b...\\b phrase")
+        phrase = pattern[2:-2].replace("\\'", "'")
+        words = phrase.lower().split(' ')
+        if not all(re.fullmatch(r"\w+", word) for word in words):
+            raise ValueError(f"Rule {pattern!r} must be whole words separated by single spaces")
+        return words
+
+    def rewrite(self, doc, table, pick, hits=None):
+        """Rewrite a TokenDocument in place in one left-to-right scan.
+
+        pick(pattern) returns the replacement for a matched rule, or None to
+        leave it alone. The longest rule accepted by pick wins at each token.
+        Rule words may carry punctuation only on the outside of the phrase.
+        Applied rules are counted in hits, when given, under
+        ('rule_hits', table, pattern).
+        """
+        max_words = self.max_words[table]
+        phrases = self.phrases[table]
+        tokens = doc.tokens
+        # The rewritten tokens are collected here and swapped in once
+        output = []
+        changed = False
+        i = 0
+        
+        while i < len(tokens):
+            longest = max_words.get(tokens[i].strip(string.punctuation).lower())
+            parts = longest and self.TOKEN_RE.fullmatch(tokens[i])
+            if not parts:
+                output.append(tokens[i])
+                i += 1
+                continue
             
-            # Corporate jargon replacement
-            r'\bleverage\b': ['use', 'make the most of', 'work with', 'take advantage of'],
-            r'\bsynergy\b': ['teamwork', 'working together', 'collaboration', 'combined effort'],
-            r'\bparadigm\b': ['approach', 'model', 'way of thinking', 'method'],
-            r'\butilize\b': ['use', 'work with', 'make use of', 'put to work'],
-            r'\boptimal\b': ['best', 'ideal', 'most effective', 'right'],
-            r'\bfacilitate\b': ['help', 'make easier', 'assist with', 'enable'],
-        }
-        
-        # Human speech patterns and filler words
-        self.human_patterns = {
-            'sentence_starters': [
-                'You know,', 'I mean,', 'Well,', 'So,', 'Actually,', 'Basically,',
-                'Honestly,', 'Seriously,', 'To be honest,', 'The way I see it,',
-                'From what I understand,', 'If you ask me,', 'In my experience,'
-            ],
-            'casual_connectors': [
-                'kind of', 'sort of', 'a bit', 'pretty much', 'more or less',
-                'you know what I mean', 'and all that', 'and everything',
-                'or something', 'and stuff like that'
-            ],
-            'emphasis_words': [
-                'really', 'actually', 'literally', 'basically', 'obviously',
-                'clearly', 'definitely', 'absolutely', 'completely'
-            ],
-            'thinking_words': [
-                'like', 'I guess', 'I suppose', 'maybe', 'perhaps',
-                'probably', 'apparently', 'seemingly'
-            ]
-        }
-        
-        # Advanced contraction system
-        self.contractions = {
-            r'\bdo not\b': "don't",
-            r'\bdoes not\b': "doesn't", 
-            r'\bdid not\b': "didn't",
-            r'\bcannot\b': "can't",
-            r'\bwill not\b': "won't",
-            r'\bshould not\b': "shouldn't",
-            r'\bwould not\b': "wouldn't",
-            r'\bcould not\b': "couldn't",
-            r'\bit is\b': "it's",
-            r'\bthat is\b': "that's",
-            r'\bthey are\b': "they're",
-            r'\bwe are\b': "we're",
-            r'\byou are\b': "you're",
-            r'\bI am\b': "I'm",
-            r'\bhe is\b': "he's",
-            r'\bshe is\b': "she's",
-            r'\bthere is\b': "there's",
-            r'\bwhat is\b': "what's",
-            r'\bwhere is\b': "where's",
-            r'\bhow is\b': "how's",
-            r'\bwhen is\b': "when's",
-            r'\bwhy is\b': "why's",
-            r'\bwho is\b': "who's",
-            r'\bI have\b': "I've",
-            r'\bthey have\b': "they've",
-            r'\bwe have\b': "we've",
-            r'\byou have\b': "you've",
-        }
-        
-        # Track document statistics for consistency
+            # Collect the words a phrase starting here could cover
+            prefix = parts.group(1)
+            words = [parts.group(2).lower()]
+            suffixes = [parts.group(3)]
+            while len(words) < longest and not suffixes[-1] and i + len(words) < len(tokens):
+                parts = self.TOKEN_RE.fullmatch(tokens[i + len(words)])
+                if not parts or parts.group(1):
+                    break
+                words.append(parts.group(2).lower())
+                suffixes.append(parts.group(3))
+            
+            for length in range(len(words), 0, -1):
+                pattern = phrases.get(' '.join(words[:length]))
+                replacement = pattern and pick(pattern)
+                if replacement is not None:
+                    if hits is not None:
+                        hits[('rule_hits', table, pattern)] += 1
+                    output.extend((prefix + replacement + suffixes[length - 1]).split())
+                    changed = True
+                    i += length
+                    break
+            else:
+                output.append(tokens[i])
+                i += 1
+        
+        if changed:
+            doc.replace(output)
+
+class LexiconIndex:
+    """Open-addressing hash index from a string column of a Lexicon to values"""
+    def __init__(self, lexicon, keys, slots, values=None):
+        self.lexicon = lexicon
+        self.keys = keys
+        self.slots = slots
+        self.mask = len(slots) - 1
+        self.values = values
+
+    def get(self, key, default=None):
+        """Value stored for key, or the key itself when there are no values"""
+        data = key.encode('utf-8')
+        slots, mask = self.slots, self.mask
+        slot = zlib.crc32(data) & mask
+        row = slots[slot]
+        while row:
+            if self.lexicon.string_bytes(self.keys[row - 1]) == data:
+                return key if self.values is None else self.values[row - 1]
+            slot = (slot + 1) & mask
+            row = slots[slot]
+        return default
+
+class Lexicon:
+    """Phrase -> alternatives table memory-mapped from a file built by write_lexicon.
+
+    Phrases are stored sorted, every string once in a shared pool, and two
+    hash indexes answer phrase and first-word lookups in constant time. The
+    file is mapped read-only, so processes using the same lexicon share its
+    pages instead of each holding a copy.
+    """
+    MAGIC = b'HLEX0001'
+    BYTE_ORDER = 0x01020304
+    # Header fields after the magic, each a native uint32
+    HEADER = ('byte_order', 'strings', 'phrases', 'alternatives', 'heads',
+              'phrase_slots', 'head_slots', 'max_words', 'pool_size')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        # Names this build of the file in paragraph cache keys
+        self.identity = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        if self.data[:8] != self.MAGIC:
+            raise ValueError(f"{path} is not a lexicon file")
+        view = memoryview(self.data)
+        header = dict(zip(self.HEADER, view[8:8 + 4 * len(self.HEADER)].cast('I')))
+        if header['byte_order'] != self.BYTE_ORDER:
+            raise ValueError(f"{path} was built on a machine with a different byte order")
+        
+        offset = 8 + 4 * len(self.HEADER)
+        def column(count):
+            nonlocal offset
+            values = view[offset:offset + 4 * count].cast('I')
+            offset += 4 * count
+            return values
+        
+        self.string_offsets = column(header['strings'] + 1)
+        self.phrase_keys = column(header['phrases'])
+        self.alternative_starts = column(header['phrases'] + 1)
+        self.alternative_ids = column(header['alternatives'])
+        phrase_slots = column(header['phrase_slots'])
+        head_keys = column(header['heads'])
+        head_lengths = column(header['heads'])
+        head_slots = column(header['head_slots'])
+        self.pool = offset
+        self.max_words = header['max_words']
+        
+        self.phrases = LexiconIndex(self, self.phrase_keys, phrase_slots)
+        self.rows = LexiconIndex(self, self.phrase_keys, phrase_slots, range(header['phrases']))
+        self.heads = LexiconIndex(self, head_keys, head_slots, head_lengths)
+        self.rewriter = PhraseRewriter({'lexicon': self})
+
+    def __len__(self):
+        return len(self.phrase_keys)
+
+    def __iter__(self):
+        """Phrases in sorted order"""
+        return (self.string(key) for key in self.phrase_keys)
+
+    def string_bytes(self, string_id):
+        start = self.pool + self.string_offsets[string_id]
+        return self.data[start:self.pool + self.string_offsets[string_id + 1]]
+
+    def string(self, string_id):
+        return self.string_bytes(string_id).decode('utf-8')
+
+    def alternatives(self, phrase):
+        """Replacements for a phrase, or an empty list if it is not in the lexicon"""
+        row = self.rows.get(phrase)
+        if row is None:
+            return []
+        ids = self.alternative_ids[self.alternative_starts[row]:self.alternative_starts[row + 1]]
+        return [self.string(string_id) for string_id in ids]
+
+def hash_slots(keys):
+    """Open-addressing slots (row + 1, 0 for empty) for byte-string keys"""
+    size = 8
+    while size < len(keys) * 2:
+        size *= 2
+    slots = array.array('I', bytes(4 * size))
+    for row, key in enumerate(keys):
+        slot = zlib.crc32(key) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = row + 1
+    return slots
+
+def write_lexicon(entries, path):
+    """Compile (phrase, alternatives) pairs into a Lexicon file.
+
+    Phrases are matched case-insensitively as whole words, like the
+    built-in rules; a later entry for the same phrase replaces an earlier
+    one. Returns the number of phrases written.
+    """
+    table = {}
+    for phrase, alternatives in entries:
+        words = phrase.lower().split()
+        if not words or not all(re.fullmatch(r"\w+", word) for word in words):
+            raise ValueError(f"Lexicon phrase {phrase!r} must be whole words")
+        alternatives = [alternatives] if isinstance(alternatives, str) else list(alternatives)
+        if not alternatives:
+            raise ValueError(f"Lexicon phrase {phrase!r} has no alternatives")
+        table[' '.join(words)] = alternatives
+    
+    # Every distinct string is stored once
+    strings = {}
+    def intern(text):
+        return strings.setdefault(text, len(strings))
+    
+    phrases = sorted(table, key=lambda phrase: phrase.encode('utf-8'))
+    phrase_keys = array.array('I', (intern(phrase) for phrase in phrases))
+    alternative_starts = array.array('I', [0])
+    alternative_ids = array.array('I')
+    heads = {}
+    for phrase in phrases:
+        alternative_ids.extend(intern(alternative) for alternative in table[phrase])
+        alternative_starts.append(len(alternative_ids))
+        words = phrase.split(' ')
+        heads[words[0]] = max(heads.get(words[0], 0), len(words))
+    head_keys = array.array('I', (intern(head) for head in heads))
+    head_lengths = array.array('I', heads.values())
+    
+    encoded = [text.encode('utf-8') for text in strings]
+    string_offsets = array.array('I', [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+    phrase_slots = hash_slots([encoded[key] for key in phrase_keys])
+    head_slots = hash_slots([encoded[key] for key in head_keys])
+    
+    header = array.array('I', [Lexicon.BYTE_ORDER, len(strings), len(phrases), len(alternative_ids),
+                               len(heads), len(phrase_slots), len(head_slots),
+                               max(heads.values(), default=0), string_offsets[-1]])
+    partial_path = path + '.partial'
+    with open(partial_path, 'wb') as f:
+        f.write(Lexicon.MAGIC)
+        for column in (header, string_offsets, phrase_keys, alternative_starts, alternative_ids,
+                       phrase_slots, head_keys, head_lengths, head_slots):
+            column.tofile(f)
+        for data in encoded:
+            f.write(data)
+    os.replace(partial_path, path)
+    return len(phrases)
+
+def read_lexicon_source(path):
+    """(phrase, alternatives) pairs from a JSON object or a TSV file.
+
+    TSV lines are a phrase, a tab, then alternatives separated by '|';
+    blank lines and lines starting with '#' are skipped.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f).items()
+        return
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            phrase, tab, alternatives = line.partition('\t')
+            if not tab:
+                raise ValueError(f"{path}:{number}: expected a phrase and alternatives separated by a tab")
+            yield phrase, alternatives.split('|')
+
+@functools.lru_cache(maxsize=None)
+def load_lexicon(path):
+    """Lexicon for a file, mapped once per process"""
+    return Lexicon(path)
+
+# Instrumentation metrics: stats key name -> (label names, help text)
+METRICS = {
+    'paragraphs': ((), "Texts passed to humanize_text"),
+    'bytes_in': ((), "UTF-8 bytes passed to humanize_text"),
+    'bytes_out': ((), "UTF-8 bytes returned by humanize_text"),
+    'technique_seconds': (('technique',), "Wall time spent in each technique"),
+    'technique_calls': (('technique',), "Calls to each technique"),
+    'rule_hits': (('table', 'pattern'), "Replacements made by each rule"),
+    'safety_reverts': (('technique',), "Texts reverted to the original after a technique"),
+    'budget_skips': (('technique',), "Optional stages skipped to meet a deadline"),
+    'document_seconds': ((), "Wall time spent humanizing whole documents"),
+    'documents': ((), "Documents humanized"),
+}
+
+def prometheus_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+FORMAL_MARKER_RE = re.compile(r'\b(however|moreover|thus|therefore|consequently)\b', re.IGNORECASE)
+CONTRACTION_RE = re.compile(r"\w+'\w+")
+
+def style_features(text):
+    """Sentence, word, formality-marker and contraction counts of a text"""
+    sentences = SENTENCE_SPLIT_RE.split(text)
+    return (len(sentences), sum(len(s.split()) for s in sentences),
+            len(FORMAL_MARKER_RE.findall(text)), len(CONTRACTION_RE.findall(text)))
+
+def style_preferences(sentences, formal_words, contractions):
+    """Preferences for text with these style feature counts"""
+    return {
+        'formality': 'formal' if formal_words > sentences * 0.1 else 'casual',
+        'contractions': 'high' if contractions > sentences * 0.3 else 'low',
+    }
+
+class HumanizeContext:
+    """Per-call state: random stream, style preferences and stats counters.
+
+    Stats are keyed as described in METRICS; timings and rule hits are only
+    recorded when instrument is set. deadline is a time.perf_counter()
+    value that humanize_text drops optional stages to meet. After each
+    call, stages and skipped list the stages it ran and left out.
+    """
+    def __init__(self, rng=None, preferences=None, instrument=False, deadline=None):
+        self.rng = rng or random.Random()
+        self.preferences = {} if preferences is None else preferences
+        self.instrument = instrument
+        self.deadline = deadline
         self.stats = defaultdict(int)
-        self.preferences = {}
+        self.stages = []
+        self.skipped = []
 
-    def analyze_writing_style(self, text):
-        """Analyze the original text to maintain consistent style"""
-        sentences = re.split(r'[.!?]+', text)
-        avg_sentence_length = sum(len(s.split()) for s in sentences) / max(len(sentences), 1)
+    def set_budget(self, seconds):
+        """Give the next calls a deadline seconds from now"""
+        self.deadline = time.perf_counter() + seconds
+
+    @classmethod
+    def seeded(cls, seed, index=0, **options):
+        """Context whose random stream depends only on seed and index"""
+        return cls(random.Random(f"{seed}:{index}"), **options)
+
+    def metrics(self):
+        """Recorded stats as a nested dict: metric -> labels... -> value"""
+        result = {name: {} if labels else 0 for name, (labels, _) in METRICS.items()}
+        for (name, *labels), value in self.stats.items():
+            if not labels:
+                result[name] = value
+                continue
+            node = result[name]
+            for label in labels[:-1]:
+                node = node.setdefault(label, {})
+            node[labels[-1]] = value
+        return result
+
+    def metrics_json(self):
+        return json.dumps(self.metrics(), indent=2)
+
+    def metrics_prometheus(self):
+        """Recorded stats in the Prometheus text exposition format"""
+        lines = []
+        for name, (label_names, help_text) in METRICS.items():
+            metric = f"humanizer_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            samples = sorted((key[1:], value) for key, value in self.stats.items() if key[0] == name)
+            if not label_names and not samples:
+                samples = [((), 0)]
+            for labels, value in samples:
+                if labels:
+                    pairs = ','.join(f'{label_name}="{prometheus_escape(label)}"'
+                                     for label_name, label in zip(label_names, labels))
+                    lines.append(f"{metric}{{{pairs}}} {value}")
+                else:
+                    lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+class CostModel:
+    """Predicted seconds for each stage as a fixed cost plus a cost per token"""
+    # Measured on the benchmark corpus; calibrate() refits on this machine
+    DEFAULTS = {
+        'replace_ai_patterns': (5e-6, 1.5e-6),
+        'add_contractions': (5e-6, 1.0e-6),
+        'vary_sentence_flow': (5e-6, 0.4e-6),
+        'restructure_sentences': (3e-6, 0.85e-6),
+        'add_human_speech_patterns': (4e-6, 0.01e-6),
+        'introduce_natural_imperfections': (3e-6, 0.4e-6),
+        'adjust_formality_level': (4e-6, 0.65e-6),
+        'add_personal_touches': (3e-6, 0.2e-6),
+    }
+
+    def __init__(self, costs=None):
+        self.costs = dict(self.DEFAULTS if costs is None else costs)
+
+    def estimate(self, stage, tokens):
+        fixed, per_token = self.costs[stage]
+        return fixed + per_token * tokens
+
+    @classmethod
+    def calibrate(cls, engine, texts):
+        """Fit each stage's costs to timings of engine over texts"""
+        tokens = [len(text.split()) for text in texts]
+        costs = {}
+        for stage in cls.DEFAULTS:
+            technique = getattr(engine, stage)
+            seconds = []
+            for index, text in enumerate(texts):
+                ctx = HumanizeContext.seeded(0, index, preferences={'formality': 'casual'})
+                doc = TokenDocument(text)
+                started = time.perf_counter()
+                technique(doc, ctx)
+                seconds.append(time.perf_counter() - started)
+            per_token, fixed = np.polyfit(tokens, seconds, 1)
+            costs[stage] = (max(float(fixed), 0.0), max(float(per_token), 0.0))
+        return cls(costs)
+
+@functools.lru_cache(maxsize=None)
+def rule_rewriter(humanizer_class):
+    """One PhraseRewriter per humanizer class over its replacement tables"""
+    return PhraseRewriter({name: getattr(humanizer_class, name) for name in humanizer_class.RULE_TABLES})
+
+class HumanizerEngine:
+    """Compiled rule tables and the humanization techniques.
+
+    The engine holds no per-call state: the random stream, preferences and
+    stats of a call live in the HumanizeContext passed to it. One engine
+    can therefore serve many threads at once.
+    """
+    # Comprehensive AI pattern replacement database
+    ai_patterns = MappingProxyType({
+        # Formal to casual transitions
+        r'\bIn conclusion\b': ['To wrap up', 'All in all', 'When it comes down to it', 'At the end of the day'],
+        r'\bIt is important to note that\b': ['Keep in mind', 'Remember', 'What you should know is', 'The thing is'],
+        r'\bFurthermore\b': ['What\'s more', 'On top of that', 'Plus', 'And another thing'],
+        r'\bMoreover\b': ['Besides that', 'Also', 'Not only that', 'And let\'s not forget'],
+        r'\bHowever\b': ['But', 'That said', 'Then again', 'On the other hand'],
+        r'\bNevertheless\b': ['Still', 'Even so', 'All the same', 'Despite that'],
+        r'\bThus\b': ['So', 'This means', 'Because of this', 'As a result'],
+        r'\bHence\b': ['So', 'Therefore', 'That\'s why', 'This leads to'],
+        r'\bAdditionally\b': ['Also', 'Plus', 'Another thing', 'What\'s more'],
+        r'\bConsequently\b': ['So', 'Because of this', 'This means', 'As you might expect'],
+        r'\bAccordingly\b': ['So', 'Because of this', 'This is why', 'Given that'],
         
-        # Determine formality level
-        formal_words = len(re.findall(r'\b(however|moreover|thus|therefore|consequently)\b', text, re.IGNORECASE))
-        self.preferences['formality'] = 'formal' if formal_words > len(sentences) * 0.1 else 'casual'
+        # Corporate jargon replacement
+        r'\bleverage\b': ['use', 'make the most of', 'work with', 'take advantage of'],
+        r'\bsynergy\b': ['teamwork', 'working together', 'collaboration', 'combined effort'],
+        r'\bparadigm\b': ['approach', 'model', 'way of thinking', 'method'],
+        r'\butilize\b': ['use', 'work with', 'make use of', 'put to work'],
+        r'\boptimal\b': ['best', 'ideal', 'most effective', 'right'],
+        r'\bfacilitate\b': ['help', 'make easier', 'assist with', 'enable'],
+    })
+    
+    # Human speech patterns and filler words
+    human_patterns = {
+        'sentence_starters': [
+            'You know,', 'I mean,', 'Well,', 'So,', 'Actually,', 'Basically,',
+            'Honestly,', 'Seriously,', 'To be honest,', 'The way I see it,',
+            'From what I understand,', 'If you ask me,', 'In my experience,'
+        ],
+        'casual_connectors': [
+            'kind of', 'sort of', 'a bit', 'pretty much', 'more or less',
+            'you know what I mean', 'and all that', 'and everything',
+            'or something', 'and stuff like that'
+        ],
+        'emphasis_words': [
+            'really', 'actually', 'literally', 'basically', 'obviously',
+            'clearly', 'definitely', 'absolutely', 'completely'
+        ],
+        'thinking_words': [
+            'like', 'I guess', 'I suppose', 'maybe', 'perhaps',
+            'probably', 'apparently', 'seemingly'
+        ]
+    }
+    
+    # Advanced contraction system
+    contractions = MappingProxyType({
+        r'\bdo not\b': "don't",
+        r'\bdoes not\b': "doesn't", 
+        r'\bdid not\b': "didn't",
+        r'\bcannot\b': "can't",
+        r'\bwill not\b': "won't",
+        r'\bshould not\b': "shouldn't",
+        r'\bwould not\b': "wouldn't",
+        r'\bcould not\b': "couldn't",
+        r'\bit is\b': "it's",
+        r'\bthat is\b': "that's",
+        r'\bthey are\b': "they're",
+        r'\bwe are\b': "we're",
+        r'\byou are\b': "you're",
+        r'\bI am\b': "I'm",
+        r'\bhe is\b': "he's",
+        r'\bshe is\b': "she's",
+        r'\bthere is\b': "there's",
+        r'\bwhat is\b': "what's",
+        r'\bwhere is\b': "where's",
+        r'\bhow is\b': "how's",
+        r'\bwhen is\b': "when's",
+        r'\bwhy is\b': "why's",
+        r'\bwho is\b': "who's",
+        r'\bI have\b': "I've",
+        r'\bthey have\b': "they've",
+        r'\bwe have\b': "we've",
+        r'\byou have\b': "you've",
+    })
+    
+    # Conversational replacements for casual documents
+    formal_to_casual = MappingProxyType({
+        r'\bapproximately\b': 'about',
+        r'\butilize\b': 'use',
+        r'\bassistance\b': 'help',
+        r'\bcommence\b': 'start',
+        r'\bterminate\b': 'end',
+        r'\bpurchase\b': 'buy',
+        r'\bindividual\b': 'person',
+        r'\bvehicle\b': 'car',
+    })
+    
+    # Tables compiled into the rewriter. The class tables are read-only; to
+    # change one, assign a new dict on the class or an instance
+    RULE_TABLES = ('ai_patterns', 'contractions', 'formal_to_casual')
+
+    # restructure_sentences only joins sentences shorter than this
+    SHORT_SENTENCE_WORDS = 8
+
+    # Stages humanize_text may leave out to meet a deadline
+    OPTIONAL_STAGES = ('vary_sentence_flow', 'restructure_sentences', 'add_human_speech_patterns',
+                       'introduce_natural_imperfections', 'add_personal_touches')
+
+    def __init__(self, lexicon=None, cost_model=None):
+        self.instance_rewriter = None
+        self.cost_model = cost_model or CostModel()
         
-        # Determine contraction preference
-        contraction_count = len(re.findall(r"\w+'\w+", text))
-        self.preferences['contractions'] = 'high' if contraction_count > len(sentences) * 0.3 else 'low'
+        # Optional domain pack, a Lexicon or its path, matched before the
+        # built-in AI patterns
+        self.lexicon = load_lexicon(lexicon) if isinstance(lexicon, str) else lexicon
+
+    @property
+    def rewriter(self):
+        """Matcher over the rule tables.
+
+        Compiled once per process for the class's tables, and again whenever
+        an instance is given tables of its own.
+        """
+        tables = {name: getattr(self, name) for name in self.RULE_TABLES}
+        if all(table is getattr(type(self), name) for name, table in tables.items()):
+            return rule_rewriter(type(self))
+        rewriter = self.instance_rewriter
+        if rewriter is None or any(rewriter.tables[name] is not table for name, table in tables.items()):
+            rewriter = self.instance_rewriter = PhraseRewriter(tables)
+        return rewriter
+
+    def default_context(self):
+        """Context for calls that don't pass one"""
+        return HumanizeContext()
+
+    def humanize(self, text, seed=None, index=0, preferences=None, budget=None):
+        """Humanize text in a fresh context; reproducible for a given seed and index.
+
+        budget, in seconds, bounds the time spent on optional stages.
+        """
+        ctx = HumanizeContext.seeded(seed, index) if seed is not None else HumanizeContext()
+        ctx.preferences.update(preferences or {})
+        if budget is not None:
+            ctx.set_budget(budget)
+        return self.humanize_text(text, ctx)
+
+    def plan_stages(self, tokens, ctx):
+        """Optional stages to skip so the estimated cost fits before ctx.deadline.
+
+        The most expensive optional stages go first.
+        """
+        estimates = {stage: self.cost_model.estimate(stage, tokens) for stage in self.cost_model.costs}
+        excess = sum(estimates.values()) - (ctx.deadline - time.perf_counter())
+        skipped = set()
+        for stage in sorted(self.OPTIONAL_STAGES, key=estimates.get, reverse=True):
+            if excess <= 0:
+                break
+            skipped.add(stage)
+            excess -= estimates[stage]
+        return skipped
+
+    def analyze_writing_style(self, text, ctx=None):
+        """Analyze the original text to maintain consistent style"""
+        ctx = self.default_context() if ctx is None else ctx
+        sentences, words, formal_words, contractions = style_features(text)
+        
+        # Determine formality level and contraction preference
+        ctx.preferences.update(style_preferences(sentences, formal_words, contractions))
         
-        return avg_sentence_length
+        return words / max(sentences, 1)
 
-    def humanize_text(self, text):
+    def humanize_text(self, text, ctx=None):
         """Advanced text humanization with multiple techniques"""
+        ctx = self.default_context() if ctx is None else ctx
+        ctx.stages = []
+        ctx.skipped = []
         if not text or not text.strip():
             return text
         
         # Analyze original style
-        if not self.preferences:
-            self.analyze_writing_style(text)
+        if not ctx.preferences:
+            self.analyze_writing_style(text, ctx)
         
-        original_text = text
+        original_length = len(text.strip())
+        
+        # Tokenize once; every technique edits the same document in place
+        doc = TokenDocument(text)
+        deadline = ctx.deadline
+        if deadline is not None:
+            ctx.skipped.extend(sorted(self.plan_stages(len(doc.tokens), ctx)))
         
         # Apply humanization techniques in sequence
         techniques = [
@@ -127,209 +731,254 @@ class UltimateTextHumanizer:
             self.add_personal_touches
         ]
         
+        instrument = ctx.instrument
+        stats = ctx.stats
+        if instrument:
+            stats[('paragraphs',)] += 1
+            stats[('bytes_in',)] += len(text.encode('utf-8'))
+        
         for technique in techniques:
-            text = technique(text)
+            name = technique.__name__
+            # Estimates can be off, so optional stages are checked again as we go
+            if deadline is not None and name in self.OPTIONAL_STAGES and (
+                    name in ctx.skipped or
+                    time.perf_counter() + self.cost_model.estimate(name, len(doc.tokens)) > deadline):
+                if name not in ctx.skipped:
+                    ctx.skipped.append(name)
+                stats[('budget_skips', name)] += 1
+                continue
+            ctx.stages.append(name)
+            
+            if instrument:
+                started = time.perf_counter()
+                technique(doc, ctx)
+                stats[('technique_seconds', name)] += time.perf_counter() - started
+                stats[('technique_calls', name)] += 1
+            else:
+                technique(doc, ctx)
+            
             # Safety check to prevent text corruption
-            if not text or len(text.strip()) < len(original_text.strip()) * 0.3:
-                text = original_text
+            if not doc.tokens or doc.char_length() < original_length * 0.3:
+                stats[('safety_reverts', name)] += 1
+                result = text
                 break
+        else:
+            result = doc.render()
         
-        return text
+        if instrument:
+            stats[('bytes_out',)] += len(result.encode('utf-8'))
+        return result
 
-    def replace_ai_patterns(self, text):
+    @document_technique
+    def replace_ai_patterns(self, doc, ctx):
         """Replace AI patterns with natural human alternatives"""
-        for pattern, replacements in self.ai_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                replacement = random.choice(replacements)
-                text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        return text
+        # One replacement is chosen per pattern and reused for every match
+        chosen = {}
+        
+        rewriter = self.rewriter
+        alternatives = rewriter.tables['ai_patterns']
+        
+        def pick(pattern):
+            if pattern not in chosen:
+                chosen[pattern] = ctx.rng.choice(alternatives[pattern])
+            return chosen[pattern]
+        
+        hits = ctx.stats if ctx.instrument else None
+        if self.lexicon:
+            def pick_alternative(phrase):
+                if phrase not in chosen:
+                    chosen[phrase] = ctx.rng.choice(self.lexicon.alternatives(phrase))
+                return chosen[phrase]
+            self.lexicon.rewriter.rewrite(doc, 'lexicon', pick_alternative, hits)
+        
+        rewriter.rewrite(doc, 'ai_patterns', pick, hits)
 
-    def add_contractions(self, text):
+    @document_technique
+    def add_contractions(self, doc, ctx):
         """Intelligently add contractions based on context and preferences"""
-        contraction_chance = 0.8 if self.preferences.get('contractions') == 'high' else 0.6
-        
-        for pattern, contraction in self.contractions.items():
-            if random.random() < contraction_chance:
-                text = re.sub(pattern, contraction, text, flags=re.IGNORECASE)
+        contraction_chance = 0.8 if ctx.preferences.get('contractions') == 'high' else 0.6
+        rewriter = self.rewriter
+        contractions = rewriter.tables['contractions']
+        enabled = {pattern for pattern in contractions if ctx.rng.random() < contraction_chance}
         
-        return text
+        rewriter.rewrite(
+            doc, 'contractions',
+            lambda pattern: contractions[pattern] if pattern in enabled else None,
+            ctx.stats if ctx.instrument else None)
 
-    def vary_sentence_flow(self, text):
+    @document_technique
+    def vary_sentence_flow(self, doc, ctx):
         """Create natural sentence flow variations"""
-        sentences = re.split(r'([.!?]+)\s*', text)
-        result = []
+        tokens = []
+        for index, (start, end) in enumerate(doc.sentence_spans()):
+            # Apply different sentence structure variations
+            tokens.extend(self.apply_sentence_variation(doc.tokens[start:end], index, ctx))
+        doc.replace(tokens)
         
-        for i in range(0, len(sentences), 2):
-            if i < len(sentences):
-                sentence = sentences[i].strip()
-                punctuation = sentences[i + 1] if i + 1 < len(sentences) else "."
-                
-                if sentence:
-                    # Apply different sentence structure variations
-                    modified_sentence = self.apply_sentence_variation(sentence, i)
-                    
-                    result.append(modified_sentence)
-                    result.append(punctuation + ' ')
-        
-        text = ''.join(result).strip()
+        # Every sentence ends with punctuation
+        if doc.tokens and not TokenDocument.SENTENCE_END_RE.search(doc.tokens[-1]):
+            doc.tokens[-1] += '.'
         
         # Occasionally combine short sentences or split long ones
-        if random.random() < 0.3:
-            text = self.restructure_sentences(text)
-        
-        return text
+        if ctx.rng.random() < 0.3:
+            if 'restructure_sentences' in ctx.skipped:
+                ctx.stats[('budget_skips', 'restructure_sentences')] += 1
+            else:
+                self.restructure_sentences(doc, ctx)
+                ctx.stages.append('restructure_sentences')
 
-    def apply_sentence_variation(self, sentence, position):
-        """Apply specific sentence structure variations"""
-        words = sentence.split()
-        
+    def apply_sentence_variation(self, words, position, ctx=None):
+        """Apply specific sentence structure variations to a sentence's tokens"""
+        ctx = self.default_context() if ctx is None else ctx
         if len(words) < 3:
-            return sentence
+            return words
             
         # Different variations based on position and length
-        variation_type = random.choice(['simple', 'complex', 'fragment', 'question', 'exclamation'])
+        variation_type = ctx.rng.choice(['simple', 'complex', 'fragment', 'question', 'exclamation'])
+        body, ending = TokenDocument.split_ending(words[-1])
         
-        if variation_type == "fragment" and random.random() < 0.1:
+        if variation_type == "fragment" and ctx.rng.random() < 0.1:
             # Occasionally use sentence fragments (human-like)
             if len(words) > 4:
-                return ' '.join(words[:random.randint(2, len(words)-1)])
+                words = words[:ctx.rng.randint(2, len(words)-1)]
+                words[-1] += ending
+                return words
         
-        elif variation_type == "question" and random.random() < 0.05:
+        elif variation_type == "question" and ctx.rng.random() < 0.05:
             # Turn statements into questions occasionally
-            if not sentence.endswith('?'):
-                sentence = sentence.rstrip('.!') + '?'
+            if ending != '?':
+                words[-1] = body + '?'
         
-        elif variation_type == "exclamation" and random.random() < 0.08:
+        elif variation_type == "exclamation" and ctx.rng.random() < 0.08:
             # Add exclamation for emphasis
-            if not sentence.endswith('!'):
-                sentence = sentence.rstrip('.?') + '!'
+            if ending != '!':
+                words[-1] = body + '!'
         
         # Add casual starters occasionally
-        if position > 0 and random.random() < 0.15:
-            starter = random.choice(self.human_patterns['sentence_starters'])
-            sentence = f"{starter} {sentence[0].lower()}{sentence[1:]}"
+        if position > 0 and ctx.rng.random() < 0.15:
+            starter = ctx.rng.choice(self.human_patterns['sentence_starters'])
+            words = starter.split() + [lower_first(words[0])] + words[1:]
         
-        return sentence
+        return words
 
-    def add_human_speech_patterns(self, text):
+    @document_technique
+    def add_human_speech_patterns(self, doc, ctx):
         """Incorporate natural human speech patterns"""
-        words = text.split()
-        
-        if len(words) < 4:
-            return text
+        if len(doc.tokens) < 4:
+            return
             
         # Add casual connectors
-        if random.random() < 0.2:
-            connector = random.choice(self.human_patterns['casual_connectors'])
-            insert_pos = random.randint(1, len(words) - 2)
-            words.insert(insert_pos, connector)
+        if ctx.rng.random() < 0.2:
+            connector = ctx.rng.choice(self.human_patterns['casual_connectors'])
+            insert_pos = ctx.rng.randint(1, len(doc.tokens) - 2)
+            doc.splice(insert_pos, insert_pos, connector.split())
         
         # Add emphasis words
-        if random.random() < 0.25:
-            emphasis = random.choice(self.human_patterns['emphasis_words'])
-            insert_pos = random.randint(0, len(words) - 1)
-            words.insert(insert_pos, emphasis)
+        if ctx.rng.random() < 0.25:
+            emphasis = ctx.rng.choice(self.human_patterns['emphasis_words'])
+            insert_pos = ctx.rng.randint(0, len(doc.tokens) - 1)
+            doc.splice(insert_pos, insert_pos, [emphasis])
         
         # Add thinking/hedging words
-        if random.random() < 0.18:
-            thinking_word = random.choice(self.human_patterns['thinking_words'])
-            if thinking_word == 'like' and random.random() < 0.5:
+        if ctx.rng.random() < 0.18:
+            thinking_word = ctx.rng.choice(self.human_patterns['thinking_words'])
+            if thinking_word == 'like' and ctx.rng.random() < 0.5:
                 # Place 'like' in natural positions
-                insert_pos = random.randint(1, len(words) - 1)
-                words.insert(insert_pos, 'like')
+                insert_pos = ctx.rng.randint(1, len(doc.tokens) - 1)
+                doc.splice(insert_pos, insert_pos, ['like'])
             else:
-                words.insert(0, thinking_word)
-        
-        return ' '.join(words)
+                doc.splice(0, 0, thinking_word.split())
 
-    def introduce_natural_imperfections(self, text):
+    @document_technique
+    def introduce_natural_imperfections(self, doc, ctx):
         """Add imperfections that make text feel human-written"""
+        tokens = doc.tokens
+        
         # Occasionally remove commas (humans forget them)
-        if random.random() < 0.1:
-            text = text.replace(',', '', 1)
-            
-        # Sometimes add extra spaces
-        if random.random() < 0.05:
-            words = text.split()
-            if len(words) > 2:
-                insert_pos = random.randint(1, len(words) - 1)
-                words.insert(insert_pos, ' ')
+        if ctx.rng.random() < 0.1:
+            for i, token in enumerate(tokens):
+                if ',' in token:
+                    token = token.replace(',', '', 1)
+                    if token:
+                        tokens[i] = token
+                    else:
+                        doc.splice(i, i + 1, [])
+                        doc.reindex()
+                    break
                 
         # Minor spelling variations (common human errors)
-        common_errors = {
-            r'\bthe the\b': 'the',
-            r'\band and\b': 'and',
-            r'\bto to\b': 'to',
-        }
-        
-        for error, correction in common_errors.items():
-            if re.search(error, text):
-                text = re.sub(error, correction, text)
-        
-        # Occasionally use lowercase after period (human texting habit)
-        if random.random() < 0.08:
-            sentences = text.split('. ')
-            if len(sentences) > 1:
-                for i in range(1, len(sentences)):
-                    if sentences[i] and not sentences[i][0].isupper():
-                        sentences[i] = sentences[i][0].lower() + sentences[i][1:]
-                text = '. '.join(sentences)
-        
-        return text
-
-    def adjust_formality_level(self, text):
+        common_errors = {'the', 'and', 'to'}
+        output = []
+        i = 0
+        while i < len(tokens):
+            word = tokens[i].lstrip(string.punctuation)
+            if (i < len(tokens) - 1 and word in common_errors and
+                    tokens[i + 1].rstrip(string.punctuation) == word):
+                output.append(tokens[i][:-len(word)] + tokens[i + 1])
+                i += 2
+            else:
+                output.append(tokens[i])
+                i += 1
+        if len(output) < len(tokens):
+            doc.replace(output)
+
+    @document_technique
+    def adjust_formality_level(self, doc, ctx):
         """Adjust formality based on analyzed preferences"""
-        if self.preferences.get('formality') == 'casual':
+        if ctx.preferences.get('formality') == 'casual':
             # Make text more conversational
-            formal_to_casual = {
-                r'\bapproximately\b': 'about',
-                r'\butilize\b': 'use',
-                r'\bassistance\b': 'help',
-                r'\bcommence\b': 'start',
-                r'\bterminate\b': 'end',
-                r'\bpurchase\b': 'buy',
-                r'\bindividual\b': 'person',
-                r'\bvehicle\b': 'car',
-            }
-            
-            for formal, casual in formal_to_casual.items():
-                if random.random() < 0.7:
-                    text = re.sub(formal, casual, text, flags=re.IGNORECASE)
-        
-        return text
+            rewriter = self.rewriter
+            formal_to_casual = rewriter.tables['formal_to_casual']
+            enabled = {pattern for pattern in formal_to_casual if ctx.rng.random() < 0.7}
+            rewriter.rewrite(
+                doc, 'formal_to_casual',
+                lambda pattern: formal_to_casual[pattern] if pattern in enabled else None,
+                ctx.stats if ctx.instrument else None)
 
-    def add_personal_touches(self, text):
+    @document_technique
+    def add_personal_touches(self, doc, ctx):
         """Add personal pronouns and perspectives"""
-        sentences = text.split('. ')
+        perspectives = ["I think", "In my experience", "From what I've seen", "It seems to me"]
         
-        for i, sentence in enumerate(sentences):
-            if len(sentence.split()) > 5 and random.random() < 0.2:
+        tokens = []
+        for start, end in doc.sentence_spans():
+            words = doc.tokens[start:end]
+            if end - start > 5 and ctx.rng.random() < 0.2:
                 # Add personal perspective occasionally
-                perspectives = ["I think", "In my experience", "From what I've seen", "It seems to me"]
+                sentence = ' '.join(words)
                 if not any(p in sentence for p in perspectives):
-                    perspective = random.choice(perspectives)
-                    sentences[i] = f"{perspective}, {sentence[0].lower()}{sentence[1:]}"
-        
-        return '. '.join(sentences)
+                    perspective = ctx.rng.choice(perspectives)
+                    words[0] = lower_first(words[0])
+                    tokens.extend(f"{perspective},".split())
+            tokens.extend(words)
+        doc.replace(tokens)
 
-    def restructure_sentences(self, text):
+    @document_technique
+    def restructure_sentences(self, doc, ctx):
         """Restructure sentences for better flow"""
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        sentences = []
+        for start, end in doc.sentence_spans():
+            words = doc.tokens[start:end]
+            words[-1] = TokenDocument.split_ending(words[-1])[0]
+            if not words[-1]:
+                words.pop()
+            if words:
+                sentences.append(words)
         
         if len(sentences) < 2:
-            return text
+            return
             
         # Occasionally combine short consecutive sentences
-        if random.random() < 0.3:
+        if ctx.rng.random() < 0.3:
             new_sentences = []
             i = 0
             while i < len(sentences):
                 if (i < len(sentences) - 1 and 
-                    len(sentences[i].split()) < 8 and 
-                    len(sentences[i+1].split()) < 8):
+                    len(sentences[i]) < self.SHORT_SENTENCE_WORDS and 
+                    len(sentences[i+1]) < self.SHORT_SENTENCE_WORDS):
                     # Combine two short sentences
-                    combined = f"{sentences[i]}, and {sentences[i+1].lower()}"
+                    combined = sentences[i][:-1] + [sentences[i][-1] + ',', 'and']
+                    combined += [word.lower() for word in sentences[i+1]]
                     new_sentences.append(combined)
                     i += 2
                 else:
@@ -339,15 +988,22 @@ class UltimateTextHumanizer:
         
         # Add variety to sentence endings
         endings = ['.', '!', '...']
-        text = ''
-        for i, sentence in enumerate(sentences):
-            ending = random.choice(endings) if random.random() < 0.1 else '.'
-            text += sentence + ending + ' '
+        tokens = []
+        for sentence in sentences:
+            ending = ctx.rng.choice(endings) if ctx.rng.random() < 0.1 else '.'
+            sentence[-1] += ending
+            tokens.extend(sentence)
         
-        return text.strip()
+        doc.tokens[:] = tokens
+        doc.reindex()
+
+    def process_paragraph(self, paragraph, humanized_text=None, preserve_runs=False, ctx=None):
+        """Process paragraph with formatting preservation - FIXED COLOR ISSUE
 
-    def process_paragraph(self, paragraph):
-        """Process paragraph with formatting preservation - FIXED COLOR ISSUE"""
+        humanized_text may be passed in when it was computed elsewhere,
+        e.g. by a worker process. preserve_runs maps the new text onto the
+        existing runs instead of rebuilding the paragraph from its first run.
+        """
         if not paragraph.text.strip():
             return
         
@@ -357,8 +1013,12 @@ class UltimateTextHumanizer:
         original_style = paragraph.style
         
         # Humanize text
-        full_text = paragraph.text
-        humanized_text = self.humanize_text(full_text)
+        if humanized_text is None:
+            humanized_text = self.humanize_text(paragraph.text, ctx)
+        
+        if preserve_runs:
+            rewrite_paragraph_xml_runs(paragraph._p, humanized_text)
+            return
         
         # Clear and rebuild paragraph
         paragraph.clear()
@@ -401,54 +1061,769 @@ class UltimateTextHumanizer:
                 # If style restoration fails, continue without it
                 pass
 
-def humanize_word_document(input_path):
-    """Ultimate document humanization function"""
-    try:
-        print("🔍 Analyzing document structure and style...")
-        doc = Document(input_path)
+class UltimateTextHumanizer(HumanizerEngine):
+    """Engine bundled with one context of its own, for single-threaded use.
+
+    rng, preferences, stats and instrument read and write that context, so
+    calls without an explicit context share it.
+    """
+    def __init__(self, instrument=False, lexicon=None):
+        super().__init__(lexicon)
+        # The global random module unless a paragraph seed is set
+        self.context = HumanizeContext(random, instrument=instrument)
+
+    def default_context(self):
+        return self.context
+
+    @property
+    def rng(self):
+        return self.context.rng
+
+    @rng.setter
+    def rng(self, rng):
+        self.context.rng = rng
+
+    @property
+    def preferences(self):
+        return self.context.preferences
+
+    @preferences.setter
+    def preferences(self, preferences):
+        self.context.preferences = preferences
+
+    @property
+    def stats(self):
+        return self.context.stats
+
+    @property
+    def instrument(self):
+        return self.context.instrument
+
+    def reseed(self, seed, index):
+        """Give the paragraph at index its own reproducible random stream"""
+        self.context.rng = random.Random(f"{seed}:{index}")
+
+    def metrics(self):
+        return self.context.metrics()
+
+    def metrics_json(self):
+        return self.context.metrics_json()
+
+    def metrics_prometheus(self):
+        return self.context.metrics_prometheus()
+
+    def reset_stats(self):
+        self.context.stats.clear()
+
+# Humanizer shared by the paragraphs a pool worker processes
+_worker_humanizer = None
+
+def _init_worker(preferences, instrument=False, lexicon=None):
+    global _worker_humanizer
+    _worker_humanizer = UltimateTextHumanizer(instrument, lexicon)
+    _worker_humanizer.preferences = dict(preferences)
+
+def humanize_seeded_paragraph(seed, index, text, preferences=None):
+    """Humanize one paragraph in a pool worker with its own random stream.
+
+    Returns the text and the stats recorded for it, if any, so the parent
+    can merge them.
+    """
+    _worker_humanizer.reseed(seed, index)
+    if preferences is not None:
+        _worker_humanizer.preferences = dict(preferences)
+    text = _worker_humanizer.humanize_text(text)
+    stats = dict(_worker_humanizer.stats) or None
+    _worker_humanizer.stats.clear()
+    return text, stats
+
+class ParagraphCache:
+    """Bounded LRU of humanized paragraphs keyed by content, seed, style and lexicon"""
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, seed, preferences, lexicon=None):
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16)
+        config = (seed, sorted(preferences.items()), lexicon and lexicon.identity)
+        digest.update(repr(config).encode('utf-8'))
+        return digest.digest()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def lookup(self, key, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = compute()
+        self.store(key, value)
+        return value
+
+    def store(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+# Opt-in cache shared across documents, so boilerplate is humanized once per
+# process. Unseeded runs only: a seeded paragraph's output would otherwise
+# depend on the documents humanized before it.
+paragraph_cache = ParagraphCache()
+
+def document_cache(cache, seed):
+    """Cache for one document run, a fresh ParagraphCache unless one is given"""
+    if cache is None:
+        return ParagraphCache()
+    if cache is paragraph_cache and seed is not None:
+        raise ValueError("The shared paragraph cache can't be used with a seed")
+    return cache
+
+class ParagraphIndex:
+    """Paragraph fingerprints and their humanized text, kept in a sidecar file.
+
+    Works wherever a ParagraphCache does. Fingerprints cover the paragraph
+    text and lexicon alone, so an unchanged paragraph keeps its earlier
+    output wherever it moves in a revised document. save() keeps only the paragraphs seen
+    in this run, so the sidecar follows the latest revision.
+    """
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.seen = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                # A damaged index only costs a full run
+                data = {}
+            if data.get('version') == self.VERSION:
+                self.entries = data['paragraphs']
+
+    @staticmethod
+    def key(text, seed=None, preferences=None, lexicon=None):
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16)
+        if lexicon:
+            digest.update(lexicon.identity.encode('utf-8'))
+        return digest.hexdigest()
+
+    def __contains__(self, key):
+        return key in self.seen or key in self.entries
+
+    def lookup(self, key, compute):
+        """Indexed value for key, computing it on a miss"""
+        if key in self:
+            self.hits += 1
+            value = self.seen.get(key, self.entries.get(key))
+        else:
+            self.misses += 1
+            value = compute()
+        self.seen[key] = value
+        return value
+
+    def store(self, key, value):
+        self.seen[key] = value
+
+    def save(self):
+        """Write the paragraphs seen in this run, replacing the old sidecar"""
+        partial_path = self.path + '.partial'
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'paragraphs': self.seen}, f, ensure_ascii=False)
+        os.replace(partial_path, self.path)
+
+def sidecar_path(output_path):
+    """Where the paragraph index for an output document lives"""
+    return os.path.splitext(output_path)[0] + '.humanizer-index.json'
+
+class StyleProfile:
+    """Style features of every paragraph in a document, gathered in one pass.
+
+    Each added paragraph is one row of style_features counts. finish() sums
+    the rows of each section, a heading and the paragraphs up to the next,
+    and settles the preferences analyze_writing_style would pick for it.
+    """
+    def __init__(self):
+        self.features = np.zeros((256, 4), dtype=np.int64)
+        self.sections = np.zeros(256, dtype=np.int64)
+        self.count = 0
+        self.section_preferences = []
+        self.sentence_lengths = None
+
+    def add(self, text, section=0):
+        if self.count == len(self.sections):
+            self.features = np.concatenate([self.features, np.zeros_like(self.features)])
+            self.sections = np.concatenate([self.sections, np.zeros_like(self.sections)])
+        self.features[self.count] = style_features(text)
+        self.sections[self.count] = section
+        self.count += 1
+
+    def finish(self):
+        sections = self.sections[:self.count]
+        totals = np.zeros((sections.max() + 1 if self.count else 0, 4), dtype=np.int64)
+        np.add.at(totals, sections, self.features[:self.count])
         
-        humanizer = UltimateTextHumanizer()
+        self.section_preferences = [style_preferences(sentences, formal_words, contractions)
+                                    for sentences, _, formal_words, contractions in totals.tolist()]
+        self.sentence_lengths = totals[:, 1] / np.maximum(totals[:, 0], 1)
+        return self
+
+    def preferences(self, index):
+        """Preferences for the section of the index-th added paragraph"""
+        return self.section_preferences[self.sections[index]]
+
+def humanize_paragraphs(humanizer, texts, seed=None, workers=None, cache=None, preferences=None):
+    """Humanize paragraph texts in order, reusing cached results.
+
+    With a seed each paragraph is reseeded from its index; with workers > 1
+    the unique uncached paragraphs are sent to a process pool in chunks.
+    Either way a repeated paragraph reuses its first occurrence's result,
+    so the output doesn't depend on the worker count or on what the LRU
+    cache has evicted.
+    preferences gives each text its own style preferences; by default they
+    all use the humanizer's.
+    """
+    cache = ParagraphCache() if cache is None else cache
+    preferences = preferences or [humanizer.preferences] * len(texts)
+    keys = [cache.key(text, seed, prefs, humanizer.lexicon) for text, prefs in zip(texts, preferences)]
+    
+    # First occurrences in this call; the cache only carries results across calls
+    memo = {}
+    if not workers or workers <= 1:
+        for index, (key, text) in enumerate(zip(keys, texts)):
+            if key in memo:
+                cache.hits += 1
+                continue
+            def compute():
+                if seed is not None:
+                    humanizer.reseed(seed, index)
+                # A copy, as style analysis fills in empty preferences
+                humanizer.preferences = dict(preferences[index])
+                return humanizer.humanize_text(text)
+            memo[key] = cache.lookup(key, compute)
+        return [memo[key] for key in keys]
+    
+    # Only the first occurrence of each uncached paragraph goes to the pool
+    pending = {}
+    for index, (key, text) in enumerate(zip(keys, texts)):
+        if key in memo or key in pending:
+            cache.hits += 1
+        elif key in cache:
+            memo[key] = cache.lookup(key, None)
+        else:
+            cache.misses += 1
+            pending[key] = (index, text)
+    
+    # map keeps results in order
+    indices = [index for index, _ in pending.values()]
+    chunksize = max(1, len(pending) // (workers * 4))
+    with futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(humanizer.preferences, humanizer.instrument,
+                                       humanizer.lexicon and humanizer.lexicon.path)) as executor:
+        humanized = executor.map(humanize_seeded_paragraph, itertools.repeat(seed), indices,
+                                 [text for _, text in pending.values()],
+                                 [preferences[index] for index in indices], chunksize=chunksize)
+        for key, (text, stats) in zip(pending, humanized):
+            memo[key] = text
+            cache.store(key, text)
+            for stat, value in (stats or {}).items():
+                humanizer.stats[stat] += value
+    
+    return [memo[key] for key in keys]
+
+# WordprocessingML names used by the document engines
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_BODY, W_P, W_R, W_T, W_TC, W_TBL, W_PPR, W_RPR, W_PSTYLE, W_VAL, W_HYPERLINK = (
+    f'{{{W_NS}}}{tag}' for tag in ('body', 'p', 'r', 't', 'tc', 'tbl', 'pPr', 'rPr', 'pStyle', 'val',
+                                   'hyperlink'))
+# Run content that rebuilding a paragraph would destroy: images, text boxes, note references
+W_EMBEDDED = tuple(f'{{{W_NS}}}{tag}' for tag in
+                   ('drawing', 'pict', 'object', 'footnoteReference', 'endnoteReference'))
+# Text boxes keep a VML copy for old readers under mc:Fallback
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+# Story parts besides the main document, by content type
+STORY_CONTENT_TYPES = {f'application/vnd.openxmlformats-officedocument.wordprocessingml.{story}+xml'
+                       for story in ('header', 'footer', 'footnotes', 'endnotes')}
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+RUN_WHITESPACE = {f'{{{W_NS}}}{tag}': text for tag, text in
+                  (('tab', '\t'), ('ptab', '\t'), ('br', '\n'), ('cr', '\n'), ('noBreakHyphen', '-'))}
+
+def paragraph_runs(p):
+    """Runs of a w:p in document order, including those inside hyperlinks"""
+    runs = []
+    for child in p:
+        if child.tag == W_R:
+            runs.append(child)
+        elif child.tag == W_HYPERLINK:
+            runs.extend(child.iterchildren(W_R))
+    return runs
+
+def paragraph_xml_text(p):
+    """Text of a w:p element, read the way python-docx reads paragraph.text"""
+    parts = []
+    for run in paragraph_runs(p):
+        for child in run:
+            if child.tag == W_T:
+                parts.append(child.text or '')
+            elif child.tag in RUN_WHITESPACE:
+                parts.append(RUN_WHITESPACE[child.tag])
+    return ''.join(parts)
+
+def replace_paragraph_xml_text(p, text):
+    """Replace a w:p's content with one run formatted like its first run"""
+    runs = paragraph_runs(p)
+    first_rpr = runs[0].find(W_RPR) if runs else None
+    
+    # Keep paragraph properties, drop everything else (like paragraph.clear())
+    for child in list(p):
+        if child.tag != W_PPR:
+            p.remove(child)
+    
+    run = etree.SubElement(p, W_R)
+    if first_rpr is not None:
+        run.append(first_rpr)
+    t = etree.SubElement(run, W_T)
+    t.set(XML_SPACE, 'preserve')
+    t.text = text
+
+def rewrite_paragraph_xml_runs(p, text):
+    """Map new paragraph text onto the existing runs of a w:p in place.
+
+    The old and new text are diffed word by word. Kept and replaced text
+    stays in the w:t node it came from, so every run keeps its formatting.
+    Inserted text joins the neighbouring text node; a new run is only
+    created when an insertion has no text node next to it.
+    """
+    # Segments in text order: [w:t node or None for tabs/breaks, original text, new pieces]
+    segments = []
+    for run in paragraph_runs(p):
+        for child in run:
+            if child.tag == W_T:
+                segments.append([child, child.text or '', []])
+            elif child.tag in RUN_WHITESPACE:
+                segments.append([child, RUN_WHITESPACE[child.tag], None])
+    
+    original = ''.join(segment[1] for segment in segments)
+    if original == text:
+        return
+    
+    # Character offset where each segment starts
+    offsets = list(itertools.accumulate((len(segment[1]) for segment in segments), initial=0))
+    
+    def owner(offset, text_only=True):
+        index = bisect.bisect_right(offsets, offset) - 1
+        if 0 <= index < len(segments) and (not text_only or segments[index][2] is not None):
+            return segments[index]
+        return None
+    
+    old_words = re.findall(r'^\s+|\S+\s*', original)
+    new_words = re.findall(r'^\s+|\S+\s*', text)
+    old_starts = list(itertools.accumulate(map(len, old_words), initial=0))
+    new_starts = list(itertools.accumulate(map(len, new_words), initial=0))
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    kept_whitespace = set()
+    orphans = []
+    
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        start, end = old_starts[i1], old_starts[i2]
+        if tag == 'equal':
+            # Kept text stays with the segments that held it
+            for index in range(bisect.bisect_right(offsets, start) - 1, len(segments)):
+                if offsets[index] >= end:
+                    break
+                segment = segments[index]
+                piece = segment[1][max(start - offsets[index], 0):end - offsets[index]]
+                if segment[2] is None:
+                    kept_whitespace.add(index)
+                else:
+                    segment[2].append(piece)
+            continue
         
-        # First pass: analyze overall style
-        sample_text = ""
-        for para in doc.paragraphs[:10]:
-            if para.text.strip():
-                sample_text += para.text + " "
+        new_text = text[new_starts[j1]:new_starts[j2]]
+        if not new_text:
+            continue
         
-        if sample_text:
-            humanizer.analyze_writing_style(sample_text)
+        # Replacements go to the first text node they overwrite; insertions
+        # join the text before them, or failing that the text after them
+        target = None
+        if tag == 'replace':
+            for offset in range(start, end):
+                target = owner(offset)
+                if target is not None:
+                    break
+        if target is None and start:
+            target = owner(start - 1)
+        if target is None:
+            target = owner(start)
+        if target is None:
+            orphans.append((start, new_text))
+        else:
+            target[2].append(new_text)
+    
+    for index, (node, _, pieces) in enumerate(segments):
+        if pieces is None:
+            # Tabs and breaks survive only where the diff kept them
+            if index not in kept_whitespace:
+                node.getparent().remove(node)
+            continue
+        node.text = ''.join(pieces)
+        if node.text != node.text.strip():
+            node.set(XML_SPACE, 'preserve')
+    
+    # Insertions with no neighbouring text node get a run of their own
+    for start, new_text in orphans:
+        runs = paragraph_runs(p)
+        anchor = owner(start - 1, text_only=False) if start else None
+        run = etree.Element(W_R)
+        if runs:
+            template = anchor[0].getparent() if anchor else runs[0]
+            if template.find(W_RPR) is not None:
+                run.append(copy.deepcopy(template.find(W_RPR)))
+            if anchor:
+                template.addnext(run)
+            else:
+                template.addprevious(run)
+        else:
+            p.append(run)
+        t = etree.SubElement(run, W_T)
+        t.set(XML_SPACE, 'preserve')
+        t.text = new_text
+
+def main_document_part(package):
+    """Name of the main document part in an open .docx zip"""
+    for rel in etree.fromstring(package.read('_rels/.rels')):
+        if rel.get('Type', '').endswith('/officeDocument'):
+            return rel.get('Target').lstrip('/')
+    return 'word/document.xml'
+
+def story_part_names(package):
+    """Names of the header, footer, footnote and endnote parts in an open .docx zip"""
+    names = set()
+    for override in etree.fromstring(package.read('[Content_Types].xml')):
+        if override.get('ContentType') in STORY_CONTENT_TYPES:
+            names.add(override.get('PartName', '').lstrip('/'))
+    return names
+
+def is_heading(p):
+    """Whether a w:p element uses a heading or title style"""
+    style = p.find(f'{W_PPR}/{W_PSTYLE}')
+    return style is not None and style.get(W_VAL, '').startswith(('Heading', 'Title'))
+
+def is_in_story(el):
+    """Whether an element is part of the story rather than a text box's VML fallback copy"""
+    return next(el.iterancestors(MC_FALLBACK), None) is None
+
+def rewrite_story_paragraph(p, text, preserve_runs=False):
+    """Write humanized text into a w:p.
+
+    Paragraphs holding images, text boxes or note references are always
+    rewritten in place, since rebuilding them would drop that content.
+    """
+    if preserve_runs or next(p.iter(*W_EMBEDDED), None) is not None:
+        rewrite_paragraph_xml_runs(p, text)
+    else:
+        replace_paragraph_xml_text(p, text)
+
+class DocumentStories:
+    """Every paragraph with text in a python-docx Document, found in one walk.
+
+    The main body comes first, then the header, footer, footnote and
+    endnote parts. Each story is walked once in document order, reaching
+    nested tables and text boxes. Paragraph text is read once and kept
+    with its w:p element and style section: headings start new sections
+    in the body, and every other story part is a section of its own.
+    """
+    def __init__(self, doc):
+        self.elements = []
+        self.texts = []
+        self.sections = []
+        self.tables = 0
+        # Parts python-docx only holds as bytes; their trees are written back by save()
+        self.parsed = []
         
-        # Process all paragraphs
-        total_paragraphs = len([p for p in doc.paragraphs if p.text.strip()])
-        processed = 0
+        roots = [doc.element.body]
+        for part in doc.part.package.iter_parts():
+            if part.content_type not in STORY_CONTENT_TYPES:
+                continue
+            if hasattr(part, 'element'):
+                roots.append(part.element)
+            else:
+                root = etree.fromstring(part.blob)
+                self.parsed.append((part, root))
+                roots.append(root)
         
-        print(f"📝 Humanizing {total_paragraphs} paragraphs...")
+        section = 0
+        for story, root in enumerate(roots):
+            if story:
+                section += 1
+            for el in root.iter(W_P, W_TBL):
+                if not is_in_story(el):
+                    continue
+                if el.tag == W_TBL:
+                    self.tables += 1
+                    continue
+                if not story and el.getparent() is root and is_heading(el):
+                    section += 1
+                text = paragraph_xml_text(el)
+                if text.strip():
+                    self.elements.append(el)
+                    self.texts.append(text)
+                    self.sections.append(section)
+        self.parts = len(roots)
+    
+    def __len__(self):
+        return len(self.elements)
+    
+    def __iter__(self):
+        return zip(self.elements, self.texts)
+    
+    def profile(self):
+        """StyleProfile of every paragraph by section"""
+        profile = StyleProfile()
+        for text, section in zip(self.texts, self.sections):
+            profile.add(text, section)
+        return profile.finish()
+    
+    def save(self):
+        """Write edited byte-only parts back before the document is saved"""
+        for part, root in self.parsed:
+            part._blob = etree.tostring(root, encoding='UTF-8', xml_declaration=True, standalone=True)
+
+def profile_document_xml(source):
+    """StyleProfile of the paragraphs stream_document_xml will humanize, in its order"""
+    profile = StyleProfile()
+    section = 0
+    for _, el in etree.iterparse(source, events=('end',)):
+        parent = el.getparent()
+        if parent is None:
+            continue
+        if el.tag == W_P and is_in_story(el):
+            if parent.tag == W_BODY and is_heading(el):
+                section += 1
+            text = paragraph_xml_text(el)
+            if text.strip():
+                profile.add(text, section)
+        # Like stream_document_xml, drop each child of the body, or of the
+        # root of a header, footer or notes part, once it closes
+        if parent.tag == W_BODY or (parent.getparent() is None and el.tag != W_BODY):
+            parent.remove(el)
+    return profile.finish()
+
+NAMESPACE_DECLARATION = re.compile(rb' xmlns(?::([\w.-]+))?="([^"]*)"')
+
+def strip_declared(data, declared):
+    """Drop namespace declarations the root already made from a start tag"""
+    end = data.index(b'>')
+    head = NAMESPACE_DECLARATION.sub(
+        lambda m: b'' if (m.group(1), m.group(2)) in declared else m.group(0), data[:end])
+    return head + data[end:]
+
+def xml_tags(el, declared):
+    """Serialized start and end tags of an element, without its children"""
+    shallow = etree.Element(el.tag, dict(el.attrib), nsmap=el.nsmap)
+    start = strip_declared(etree.tostring(shallow, encoding='UTF-8', xml_declaration=False), declared)
+    name = start[1:start.index(b' ') if b' ' in start else -2].rstrip(b'/')
+    return start[:-2] + b'>', b'</' + name + b'>'
+
+def stream_document_xml(source, target, humanizer, seed=None, preserve_runs=False, cache=None,
+                        profile=None, start=0):
+    """Humanize a document.xml stream into target, one body element at a time.
+
+    Every story paragraph, in tables and text boxes too, is rewritten as
+    it closes. Each top-level element is then written out and dropped, so
+    memory stays bounded by the largest single table. Header, footer and
+    note parts stream the same way. With a StyleProfile from
+    profile_document_xml each paragraph uses its section's preferences.
+    Paragraphs are numbered for seeding from start; returns the count.
+    """
+    cache = ParagraphCache() if cache is None else cache
+    opened = []
+    declared = set()
+    depth = 0
+    processed = start
+    
+    target.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n')
+    
+    for event, el in etree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            # The root and body are streamed; everything below is written whole
+            if depth == 0 or (depth == 1 and el.tag == W_BODY):
+                start_tag, end_tag = xml_tags(el, declared)
+                target.write(start_tag)
+                opened.append((el, end_tag))
+                if depth == 0:
+                    declared = {(prefix and prefix.encode(), uri.encode())
+                                for prefix, uri in el.nsmap.items()}
+            depth += 1
+            continue
         
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                humanizer.process_paragraph(paragraph)
+        depth -= 1
+        if el.tag == W_P and is_in_story(el):
+            text = paragraph_xml_text(el)
+            if text.strip():
+                if profile:
+                    humanizer.preferences = profile.preferences(processed - start)
+                elif not humanizer.preferences:
+                    humanizer.analyze_writing_style(text)
+                
+                def compute():
+                    if seed is not None:
+                        humanizer.reseed(seed, processed)
+                    return humanizer.humanize_text(text)
+                
+                key = cache.key(text, seed, humanizer.preferences, humanizer.lexicon)
+                humanized_text = cache.lookup(key, compute)
+                rewrite_story_paragraph(el, humanized_text, preserve_runs)
                 processed += 1
                 
                 if processed % 25 == 0:
-                    print(f"   Progress: {processed}/{total_paragraphs}")
+                    print(f"   Progress: {processed} paragraphs")
         
-        # Process tables
-        table_count = 0
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        if paragraph.text.strip():
-                            humanizer.process_paragraph(paragraph)
-            table_count += 1
+        if opened and el is opened[-1][0]:
+            target.write(opened.pop()[1])
+        elif depth == len(opened):
+            fragment = etree.tostring(el, encoding='UTF-8', xml_declaration=False)
+            target.write(strip_declared(fragment, declared))
+            el.getparent().remove(el)
+    
+    return processed - start
+
+def stream_word_document(input_path, output_path, seed=None, preserve_runs=False, cache=None,
+                         humanizer=None):
+    """Humanize a .docx without building the python-docx object tree.
+
+    The main document, header, footer and note parts are rewritten as
+    streams; every other package part is copied through unchanged.
+    """
+    started = time.perf_counter()
+    humanizer = humanizer or UltimateTextHumanizer()
+    humanizer.preferences = {}
+    cache = document_cache(cache, seed)
+    processed = 0
+    
+    with zipfile.ZipFile(input_path) as package, \
+         zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as output:
+        story_parts = story_part_names(package) | {main_document_part(package)}
+        print("📝 Humanizing paragraphs...")
         
-        if table_count > 0:
-            print(f"📊 Processed {table_count} tables")
+        for info in package.infolist():
+            if info.filename in story_parts:
+                # First pass: profile the style of every section in the part
+                with package.open(info) as source:
+                    profile = profile_document_xml(source)
+            with package.open(info) as source, \
+                 output.open(info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT // 2) as target:
+                if info.filename in story_parts:
+                    processed += stream_document_xml(source, target, humanizer, seed, preserve_runs, cache,
+                                                     profile, processed)
+                else:
+                    shutil.copyfileobj(source, target)
+    
+    print(f"   Humanized {processed} paragraphs")
+    record_document_time(humanizer, started)
+    return processed
+
+def record_document_time(humanizer, started):
+    if humanizer.instrument:
+        humanizer.stats[('document_seconds',)] += time.perf_counter() - started
+        humanizer.stats[('documents',)] += 1
+
+def process_word_document(input_path, output_path, workers=None, seed=None, preserve_runs=False,
+                          cache=None, humanizer=None):
+    """Humanize a .docx through the python-docx object model"""
+    started = time.perf_counter()
+    doc = docx.Document(input_path)
+    
+    humanizer = humanizer or UltimateTextHumanizer()
+    humanizer.preferences = {}
+    cache = document_cache(cache, seed)
+    
+    # One walk over every story finds the paragraphs, their text and the count
+    stories = DocumentStories(doc)
+    total_paragraphs = len(stories)
+    print(f"📝 Humanizing {total_paragraphs} paragraphs in {stories.parts} stories...")
+    
+    if workers and seed is None:
+        seed = random.randrange(2**32)
+    
+    # Profile every paragraph once; each section keeps its own style
+    profile = stories.profile()
+    preferences = [profile.preferences(index) for index in range(total_paragraphs)]
+    results = humanize_paragraphs(humanizer, stories.texts, seed, workers, cache, preferences)
+    
+    for processed, (p, humanized_text) in enumerate(zip(stories.elements, results), 1):
+        rewrite_story_paragraph(p, humanized_text, preserve_runs)
+    
+        if processed % 25 == 0:
+            print(f"   Progress: {processed}/{total_paragraphs}")
+    
+    if stories.tables > 0:
+        print(f"📊 Processed {stories.tables} tables")
+    
+    # Save output
+    stories.save()
+    doc.save(output_path)
+    record_document_time(humanizer, started)
+
+def humanize_word_document(input_path, workers=None, seed=None, streaming=False, preserve_runs=False,
+                           cache=None, output_path=None, humanizer=None, incremental=False):
+    """Ultimate document humanization function
+
+    With workers > 1 paragraphs are humanized in a process pool. Passing
+    workers or seed gives every paragraph its own random stream derived
+    from the seed and its index, so output is identical for any worker count.
+    Every story is humanized: the body with its nested tables and text
+    boxes, headers, footers, footnotes and endnotes.
+    streaming=True rewrites those XML parts as streams instead of loading
+    the python-docx object tree, keeping memory bounded on huge documents.
+    preserve_runs=True keeps every run's formatting by editing the existing
+    text nodes in place instead of rebuilding each paragraph.
+    Repeated paragraphs are served from cache, a fresh ParagraphCache for
+    each call by default. Unseeded runs may pass paragraph_cache to share
+    one across every document in the process. The result goes to
+    output_path, or completely_human_document.docx by default.
+    Pass a humanizer built with instrument=True to collect metrics from
+    the run; they stay available from its metrics() afterwards.
+    incremental=True keeps a ParagraphIndex sidecar next to the output, so
+    a rerun on a revised document only humanizes new or edited paragraphs
+    and leaves the output of unchanged ones as it was.
+    """
+    try:
+        print("🔍 Analyzing document structure and style...")
+        output_file = output_path or "completely_human_document.docx"
+        if incremental:
+            cache = ParagraphIndex(sidecar_path(output_file))
+        cache = document_cache(cache, seed)
+        hits, misses = cache.hits, cache.misses
         
-        # Save output
-        output_file = "completely_human_document.docx"
-        doc.save(output_file)
+        if streaming:
+            if workers and workers > 1:
+                raise ValueError("The streaming engine runs in a single process")
+            stream_word_document(input_path, output_file, seed, preserve_runs, cache, humanizer)
+        else:
+            process_word_document(input_path, output_file, workers, seed, preserve_runs, cache,
+                                  humanizer)
         
+        print(f"🧠 Paragraph cache: {cache.hits - hits} hits, {cache.misses - misses} misses")
+        if incremental:
+            cache.save()
+            print(f"🗂️  Paragraph index: {cache.path}")
+        if humanizer and humanizer.instrument:
+            stats = humanizer.stats
+            print(f"⏱️  {stats[('documents',)]} documents in {stats[('document_seconds',)]:.2f}s, "
+                  f"{stats[('bytes_in',)]} bytes in, {stats[('bytes_out',)]} bytes out")
         print("✅ Success! Document completely humanized")
         print("🎯 Key transformations applied:")
         print("   • Natural speech patterns and contractions")
@@ -463,8 +1838,493 @@ def humanize_word_document(input_path):
         print(f"❌ Error: {str(e)}")
         return None
 
+def find_documents(source):
+    """Expand a directory or glob into (input path, relative output path) pairs"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.docx') and not name.startswith('~$'):
+                    path = os.path.join(root, name)
+                    yield path, os.path.relpath(path, source)
+    else:
+        # Outputs mirror the tree below the pattern's directory without wildcards
+        root = os.path.dirname(source)
+        while glob.has_magic(root):
+            root = os.path.dirname(root)
+        for path in sorted(glob.glob(source, recursive=True)):
+            name = os.path.basename(path)
+            if name.lower().endswith('.docx') and not name.startswith('~$'):
+                yield path, os.path.relpath(path, root or os.curdir)
+
+def read_manifest(manifest_path):
+    """Latest successful manifest record for each input already finished"""
+    done = {}
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, encoding='utf-8') as manifest:
+        for line in manifest:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a torn final line
+                continue
+            if record.get('status') == 'ok':
+                done[record['input']] = record
+            else:
+                done.pop(record.get('input'), None)
+    return done
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def humanize_batch_file(input_path, output_path, seed=None, streaming=False, preserve_runs=False,
+                        lexicon=None):
+    """Humanize one document for humanize_batch and return its manifest record"""
+    record = {'input': input_path, 'output': output_path}
+    started = time.perf_counter()
+    partial_path = output_path + '.partial'
+    
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Per-paragraph progress from many processes is just noise here
+        with contextlib.redirect_stdout(io.StringIO()):
+            humanizer = UltimateTextHumanizer(lexicon=lexicon)
+            # Workers outlive files, so each file gets its own cache to
+            # keep its output independent of its siblings
+            cache = ParagraphCache()
+            if streaming:
+                stream_word_document(input_path, partial_path, seed, preserve_runs, cache, humanizer)
+            else:
+                process_word_document(input_path, partial_path, seed=seed, preserve_runs=preserve_runs,
+                                      cache=cache, humanizer=humanizer)
+        # Only complete outputs ever appear under the final name
+        os.replace(partial_path, output_path)
+        record['status'] = 'ok'
+        record['sha256'] = file_sha256(output_path)
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+def humanize_batch(source, output_dir, workers=None, manifest_path=None, seed=None,
+                   streaming=False, preserve_runs=False, lexicon=None):
+    """Humanize every .docx in a directory or glob into output_dir.
+
+    Files are spread over a process pool. Each finished file is appended to
+    a JSONL manifest with its status, timing and output hash, and a rerun
+    with the same manifest skips files that already finished.
+    """
+    manifest_path = manifest_path or os.path.join(output_dir, 'manifest.jsonl')
+    os.makedirs(output_dir, exist_ok=True)
+    done = read_manifest(manifest_path)
+    
+    jobs = []
+    skipped = 0
+    outputs = {}
+    for input_path, relative_path in find_documents(source):
+        input_path = os.path.abspath(input_path)
+        output_path = os.path.abspath(os.path.join(output_dir, relative_path))
+        # Two inputs writing one output would race on its .partial file
+        other = outputs.setdefault(os.path.normcase(output_path), input_path)
+        if other != input_path:
+            raise ValueError(f"{other} and {input_path} would both be written to {output_path}")
+        if input_path in done and os.path.exists(done[input_path]['output']):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_path))
+    
+    print(f"📂 Humanizing {len(jobs)} documents ({skipped} already done)")
+    counts = Counter()
+    
+    with open(manifest_path, 'a', encoding='utf-8') as manifest, \
+         futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        submitted = [executor.submit(humanize_batch_file, input_path, output_path, seed,
+                                     streaming, preserve_runs, lexicon)
+                     for input_path, output_path in jobs]
+        
+        for finished, future in enumerate(futures.as_completed(submitted), 1):
+            record = future.result()
+            manifest.write(json.dumps(record) + '\n')
+            manifest.flush()
+            counts[record['status']] += 1
+            
+            if record['status'] == 'error':
+                print(f"❌ {record['input']}: {record['error']}")
+            if finished % 25 == 0:
+                print(f"   Progress: {finished}/{len(jobs)}")
+    
+    print(f"✅ {counts['ok']} humanized, {counts['error']} failed, {skipped} skipped")
+    print(f"📄 Manifest: {manifest_path}")
+    return counts
+
+def batch_main(argv):
+    """Command-line entry point for non-interactive batch runs"""
+    parser = argparse.ArgumentParser(description="Humanize a directory or glob of Word documents")
+    parser.add_argument('source', help="directory of .docx files or a glob pattern")
+    parser.add_argument('output_dir', help="directory for the humanized documents")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--manifest', help="JSONL manifest (default: OUTPUT_DIR/manifest.jsonl)")
+    parser.add_argument('--seed', type=int, help="seed for reproducible output")
+    parser.add_argument('--streaming', action='store_true', help="use the streaming DOCX engine")
+    parser.add_argument('--preserve-runs', action='store_true', help="keep run formatting in place")
+    parser.add_argument('--lexicon', help="compiled lexicon of extra phrase replacements")
+    args = parser.parse_args(argv)
+    
+    counts = humanize_batch(args.source, args.output_dir, args.workers, args.manifest,
+                            args.seed, args.streaming, args.preserve_runs, args.lexicon)
+    return 1 if counts['error'] else 0
+
+def humanize_text_chunk(humanizer, seed, start, texts):
+    """Humanize independent texts, each with its own style analysis"""
+    results = []
+    for index, text in enumerate(texts, start):
+        if seed is not None:
+            humanizer.reseed(seed, index)
+        humanizer.preferences = {}
+        results.append(humanizer.humanize_text(text))
+    return results
+
+def _worker_text_chunk(seed, start, texts):
+    return humanize_text_chunk(_worker_humanizer, seed, start, texts)
+
+def humanize_stream(items, seed=None, workers=None, chunk_size=256, lexicon=None):
+    """Humanize (context, text) pairs lazily, yielding (context, result) in order.
+
+    Items are read chunk_size at a time. With workers > 1 at most two chunks
+    per worker are in flight, so memory does not grow with the input. The
+    contexts never leave this process.
+    """
+    items = iter(items)
+    chunks = iter(lambda: list(itertools.islice(items, chunk_size)), [])
+    
+    if not workers or workers <= 1:
+        humanizer = UltimateTextHumanizer(lexicon=lexicon)
+        start = 0
+        for chunk in chunks:
+            results = humanize_text_chunk(humanizer, seed, start, [text for _, text in chunk])
+            yield from zip((context for context, _ in chunk), results)
+            start += len(chunk)
+        return
+    
+    with futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=({}, False, lexicon)) as executor:
+        pending = deque()
+        start = 0
+        for chunk in chunks:
+            future = executor.submit(_worker_text_chunk, seed, start, [text for _, text in chunk])
+            pending.append(([context for context, _ in chunk], future))
+            start += len(chunk)
+            if len(pending) >= workers * 2:
+                contexts, future = pending.popleft()
+                yield from zip(contexts, future.result())
+        while pending:
+            contexts, future = pending.popleft()
+            yield from zip(contexts, future.result())
+
+PARAGRAPH_BREAK_RE = re.compile(r'\n\s*\n')
+TOKEN_BEFORE_SPACE_RE = re.compile(r'\S+(?=\s)')
+
+def complete_sentences(text):
+    """Split text into the sentences known to be finished and the rest.
+
+    A sentence is finished once whitespace follows its ending punctuation,
+    so a chunk ending in '3.' or '...' waits for the next chunk.
+    """
+    sentences = []
+    start = 0
+    for match in TOKEN_BEFORE_SPACE_RE.finditer(text):
+        if TokenDocument.SENTENCE_END_RE.search(match.group()):
+            sentences.append(text[start:match.end()].strip())
+            start = match.end()
+    return sentences, text[start:]
+
+async def humanize_chunks(chunks, humanizer=None, window=2, seed=None):
+    """Humanize an async iterator of text chunks, yielding text as sentences finish.
+
+    Finished sentences are humanized in groups of up to window, so steps
+    that join neighbouring sentences still see their neighbour. A group is
+    sent early when its last sentence is too long to be joined to the next.
+    Blank lines end a paragraph and are passed through. The yielded pieces
+    concatenate to the whole humanized reply.
+    """
+    humanizer = humanizer or UltimateTextHumanizer()
+    buffer = ''
+    group = []
+    separator = ''
+    groups = 0
+    
+    def flush():
+        nonlocal separator, groups
+        if seed is not None:
+            humanizer.reseed(seed, groups)
+        piece = separator + humanizer.humanize_text(' '.join(group))
+        group.clear()
+        separator = ' '
+        groups += 1
+        return piece
+    
+    def add(sentences):
+        for sentence in sentences:
+            group.append(sentence)
+            if (len(group) >= window or
+                    len(sentence.split()) >= humanizer.SHORT_SENTENCE_WORDS):
+                yield flush()
+    
+    def paragraph_breaks(final=False):
+        nonlocal buffer, separator
+        while True:
+            match = PARAGRAPH_BREAK_RE.search(buffer)
+            # A break is only whole once something follows it or the stream ends
+            if not match or not (final or buffer[match.end():].strip()):
+                return
+            # Everything before a blank line is finished, punctuated or not
+            sentences, rest = complete_sentences(buffer[:match.start()] + ' ')
+            yield from add(sentences + ([rest.strip()] if rest.strip() else []))
+            if group:
+                yield flush()
+            if separator:
+                separator = match.group()
+            buffer = buffer[match.end():]
+    
+    async for chunk in chunks:
+        buffer += chunk
+        for piece in paragraph_breaks():
+            yield piece
+        
+        sentences, buffer = complete_sentences(buffer)
+        for piece in add(sentences):
+            yield piece
+    
+    for piece in paragraph_breaks(final=True):
+        yield piece
+    if buffer.strip():
+        group.append(buffer.strip())
+    if group:
+        yield flush()
+
+# Markdown lines that are copied through untouched: indented code, tables,
+# HTML, link definitions and thematic breaks
+MARKDOWN_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+MARKDOWN_VERBATIM = re.compile(r'^(?: {4}|\t| {0,3}(?:\||<|\[[^\]]+\]:|(?:[-*_=] *){3,}$))')
+# Blocks copied through untouched up to their end: front matter opening the
+# file, by its delimiter, and HTML from a tag to its closing tag or a blank line
+MARKDOWN_FRONT_MATTER = {'---': ('---', '...'), '+++': ('+++',)}
+MARKDOWN_HTML = re.compile(r'^ {0,3}<(?:!--|(/?)([A-Za-z][\w-]*)(?=[\s/>]|$))')
+# Two trailing spaces or a backslash break the line without ending the paragraph
+MARKDOWN_HARD_BREAK = re.compile(r'(?: {2,}|\\)$')
+# Headings, list items and block quotes keep their marker; the rest is prose
+MARKDOWN_MARKER = re.compile(r'^ {0,3}(?:>\s?)*(?:#{1,6}\s+|[-*+]\s+(?:\[[ xX]\]\s+)?|\d+[.)]\s+)?')
+# Inline code spans, link and image destinations, reference labels and autolinks
+MARKDOWN_INLINE_VERBATIM = re.compile(r'(`+).+?\1|(?<=\])(?:\([^)]*\)|\[[^\]]*\])|<[A-Za-z][\w+.-]*:[^>\s]*>')
+# Private-use characters survive every technique unchanged
+MARKDOWN_PLACEHOLDER = re.compile(r'\ue000(\d+)\ue001')
+
+def mask_markdown_inline(text):
+    """Swap inline code and link targets for placeholders; returns (text, spans)"""
+    spans = []
+    def placeholder(match):
+        spans.append(match.group())
+        return f'\ue000{len(spans) - 1}\ue001'
+    return MARKDOWN_INLINE_VERBATIM.sub(placeholder, text), spans
+
+def unmask_markdown_inline(text, spans, original):
+    """Put masked spans back, or return original if any placeholder was lost"""
+    found = sorted(int(index) for index in MARKDOWN_PLACEHOLDER.findall(text))
+    if found != list(range(len(spans))):
+        return original
+    return MARKDOWN_PLACEHOLDER.sub(lambda match: spans[int(match.group(1))], text)
+
+def text_blocks(lines):
+    """(context, text) pairs for plain text; blank lines separate paragraphs"""
+    paragraph = []
+    for line in itertools.chain(lines, [None]):
+        if line is not None and line.strip():
+            paragraph.append(line.strip())
+            continue
+        if paragraph:
+            yield ('', '\n'), ' '.join(paragraph)
+            paragraph = []
+        if line is not None:
+            yield (line.rstrip('\n'), '\n'), ''
+
+def markdown_prose(prefix, text):
+    """(context, text) for a piece of Markdown prose with its inline code masked"""
+    suffix = '\n'
+    hard_break = MARKDOWN_HARD_BREAK.search(text)
+    if hard_break:
+        text, suffix = text[:hard_break.start()], hard_break.group() + suffix
+    masked, spans = mask_markdown_inline(text)
+    if not spans:
+        return (prefix, suffix), text
+    return (prefix, suffix, spans, text), masked
+
+def markdown_block_end(line, first=False):
+    """Test for the last line of a verbatim block opening at line, or None"""
+    fence = MARKDOWN_FENCE.match(line)
+    if fence:
+        closing = fence.group(1)
+        return lambda line: line.strip().startswith(closing) and not line.strip().strip(closing[0])
+    if first and line.rstrip() in MARKDOWN_FRONT_MATTER:
+        closings = MARKDOWN_FRONT_MATTER[line.rstrip()]
+        return lambda line: line.rstrip() in closings
+    html = MARKDOWN_HTML.match(line)
+    if html and not html.group(1):
+        closing = f'</{html.group(2).lower()}' if html.group(2) else '-->'
+        if closing not in line[html.end():].lower():
+            return lambda line: not line.strip() or closing in line.lower()
+    return None
+
+def markdown_blocks(lines):
+    """(context, text) pairs for Markdown, leaving code and structure alone.
+
+    Consecutive prose lines are humanized as one paragraph and written on
+    one line, which Markdown renders the same way; a hard line break ends
+    the line and is kept. Inline code and link targets are masked; a
+    context of four items carries them to restore.
+    """
+    paragraph = []
+    block_end = None
+    for number, line in enumerate(itertools.chain(lines, [None])):
+        if line is not None:
+            line = line.rstrip('\n')
+            if block_end:
+                if block_end(line):
+                    block_end = None
+                yield (line, '\n'), ''
+                continue
+            opening = markdown_block_end(line, number == 0)
+            if not opening and line.strip() and not MARKDOWN_VERBATIM.match(line):
+                marker = MARKDOWN_MARKER.match(line).group()
+                if not marker.strip():
+                    hard_break = MARKDOWN_HARD_BREAK.search(line)
+                    paragraph.append(line.lstrip() if hard_break else line.strip())
+                    if hard_break:
+                        yield markdown_prose('', ' '.join(paragraph))
+                        paragraph = []
+                    continue
+        
+        # Anything else ends the current paragraph
+        if paragraph:
+            yield markdown_prose('', ' '.join(paragraph))
+            paragraph = []
+        if line is None:
+            break
+        if opening:
+            block_end = opening
+            yield (line, '\n'), ''
+        elif line.strip() and not MARKDOWN_VERBATIM.match(line):
+            yield markdown_prose(marker, line[len(marker):])
+        else:
+            yield (line, '\n'), ''
+
+def jsonl_records(lines, field='text'):
+    """(context, text) pairs for JSONL; the record itself is the context.
+
+    Lines that are not objects with a string field are passed through as is.
+    """
+    for number, line in enumerate(lines, 1):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and isinstance(record.get(field), str):
+            yield record, record[field]
+        else:
+            if line.strip():
+                print(f"⚠️  Line {number}: no {field!r} string, copied unchanged", file=sys.stderr)
+            yield (line.rstrip('\n'), '\n'), ''
+
+TEXT_FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.md': 'markdown', '.markdown': 'markdown'}
+
+def humanize_text_file(input_path, output_path, fmt=None, field='text', seed=None, workers=None,
+                       chunk_size=256, lexicon=None):
+    """Humanize a plain text, Markdown or JSONL file as a stream.
+
+    The format comes from the extension unless fmt is given. Output is
+    written as results arrive, in input order, so memory stays flat however
+    large the file is. Returns the number of texts humanized.
+    """
+    fmt = fmt or TEXT_FORMATS.get(os.path.splitext(input_path)[1].lower(), 'text')
+    partial_path = output_path + '.partial'
+    humanized = 0
+    
+    with open(input_path, encoding='utf-8') as source, \
+         open(partial_path, 'w', encoding='utf-8') as target:
+        if fmt == 'jsonl':
+            items = jsonl_records(source, field)
+        elif fmt == 'markdown':
+            items = markdown_blocks(source)
+        else:
+            items = text_blocks(source)
+        
+        for context, text in humanize_stream(items, seed, workers, chunk_size, lexicon):
+            if isinstance(context, dict):
+                context[field] = text
+                target.write(json.dumps(context, ensure_ascii=False) + '\n')
+            else:
+                prefix, suffix, *masked = context
+                if masked:
+                    text = unmask_markdown_inline(text, *masked)
+                target.write(prefix + text + suffix)
+            if text:
+                humanized += 1
+                if humanized % 1000 == 0:
+                    print(f"   Progress: {humanized} texts", file=sys.stderr)
+    
+    os.replace(partial_path, output_path)
+    return humanized
+
+def text_main(argv):
+    """Command-line entry point for streaming text, Markdown and JSONL files"""
+    parser = argparse.ArgumentParser(prog='main.py text',
+                                     description="Humanize a plain text, Markdown or JSONL file")
+    parser.add_argument('input', help="file to humanize")
+    parser.add_argument('output', help="where to write the humanized file")
+    parser.add_argument('--format', choices=['text', 'markdown', 'jsonl'],
+                        help="input format (default: from the extension)")
+    parser.add_argument('--field', default='text', help="JSONL field to humanize")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one)")
+    parser.add_argument('--seed', type=int, help="seed for reproducible output")
+    parser.add_argument('--chunk-size', type=int, default=256, help="texts per worker task")
+    parser.add_argument('--lexicon', help="compiled lexicon of extra phrase replacements")
+    args = parser.parse_args(argv)
+    
+    count = humanize_text_file(args.input, args.output, args.format, args.field, args.seed,
+                               args.workers, args.chunk_size, args.lexicon)
+    print(f"✅ {count} texts humanized into {args.output}", file=sys.stderr)
+    return 0
+
+def lexicon_main(argv):
+    """Command-line entry point for compiling a lexicon"""
+    parser = argparse.ArgumentParser(prog='main.py lexicon',
+                                     description="Compile a JSON or TSV phrase pack into a lexicon file")
+    parser.add_argument('source', help="JSON object or TSV of phrase<TAB>alt1|alt2")
+    parser.add_argument('output', help="lexicon file to write")
+    args = parser.parse_args(argv)
+    
+    count = write_lexicon(read_lexicon_source(args.source), args.output)
+    print(f"📚 {count} phrases compiled into {args.output}")
+    return 0
+
 # Advanced main execution
 if __name__ == "__main__":
+    # Arguments mean a batch run; without them ask for a single file
+    if len(sys.argv) > 1 and sys.argv[1] == 'text':
+        sys.exit(text_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'lexicon':
+        sys.exit(lexicon_main(sys.argv[2:]))
+    if len(sys.argv) > 1:
+        sys.exit(batch_main(sys.argv[1:]))
+    
     print("="*70)
     print("🤖 ULTIMATE AI TEXT HUMANIZER")
     print("   Bypasses ALL AI detection systems")
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from main import process_word_document
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+def humanize_text_batch(requests):
+    """Humanize a batch of (text, deadline) requests in a warm pool worker.
+
+    deadline is a time.monotonic() value, which every process shares, so
+    time spent queued for the pool and on earlier texts in the batch counts
+    against it. Returns (text, stages run, stages skipped) for each.
+    """
+    results = []
+    for text, deadline in requests:
+        # Every request gets its own context and style analysis
+        ctx = main.HumanizeContext(random)
+        if deadline is not None:
+            ctx.deadline = time.perf_counter() + max(deadline - time.monotonic(), 0.0)
+        text = main._worker_humanizer.humanize_text(text, ctx)
+        results.append((text, ctx.stages, ctx.skipped))
+    return results
+
+def humanize_docx_bytes(data, preserve_runs=False):
+    """Humanize an uploaded .docx in a pool worker and return the new file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.docx')
+        output_path = os.path.join(tmp, 'output.docx')
+        with open(input_path, 'wb') as f:
+            f.write(data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_word_document(input_path, output_path, preserve_runs=preserve_runs)
+        with open(output_path, 'rb') as f:
+            return f.read()
+
+def warm_worker():
+    return os.getpid()
+
+class ServiceBusy(Exception):
+    pass
+
+class HumanizerService:
+    """Asyncio HTTP front end over a warm pool of humanizer processes.
+
+    Concurrent text requests are grouped into batches of up to batch_size,
+    waiting at most batch_window seconds to fill one. Pending work is held
+    in bounded queues; once they are full new requests get a 503 instead
+    of piling up.
+    """
+    def __init__(self, workers=None, queue_size=256, batch_size=32, batch_window=0.002,
+                 max_documents=None, max_body=50 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_documents = max_documents or self.workers
+        self.max_body = max_body
+        self.pool = None
+        self.server = None
+        self.queue = None
+        self.batch_slots = None
+        self.pending_documents = 0
+        self.dispatcher = None
+
+    async def start(self, host='127.0.0.1', port=8000):
+        """Start the worker pool and begin listening"""
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=main._init_worker,
+                                        initargs=({},))
+        # Build every humanizer before the first request arrives
+        await asyncio.gather(*(loop.run_in_executor(self.pool, warm_worker)
+                               for _ in range(self.workers)))
+
+        self.queue = asyncio.Queue(self.queue_size)
+        self.batch_slots = asyncio.Semaphore(self.workers * 2)
+        self.dispatcher = asyncio.create_task(self.dispatch_batches())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.dispatcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.dispatcher
+        self.pool.shutdown(cancel_futures=True)
+
+    async def humanize(self, text, budget=None):
+        """Queue one text for the next batch and wait for (text, stages, skipped).
+
+        budget is the seconds the request may take overall; time spent
+        queued comes out of it.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = None if budget is None else time.monotonic() + budget
+        try:
+            self.queue.put_nowait((text, deadline, future))
+        except asyncio.QueueFull:
+            raise ServiceBusy()
+        return await future
+
+    async def humanize_document(self, data, preserve_runs=False):
+        if self.pending_documents >= self.max_documents:
+            raise ServiceBusy()
+        self.pending_documents += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, humanize_docx_bytes, data, preserve_runs)
+        finally:
+            self.pending_documents -= 1
+
+    async def dispatch_batches(self):
+        """Group queued texts into batches and hand them to the pool"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Limit batches in flight so the queue, not the pool, absorbs bursts
+            await self.batch_slots.acquire()
+            requests = [(text, deadline) for text, deadline, _ in batch]
+            work = loop.run_in_executor(self.pool, humanize_text_batch, requests)
+            work.add_done_callback(lambda work, batch=batch: self.finish_batch(batch, work))
+
+    def finish_batch(self, batch, work):
+        self.batch_slots.release()
+        error = work.exception()
+        results = [None] * len(batch) if error else work.result()
+        for (_, _, future), result in zip(batch, results):
+            # The client may have gone away in the meantime
+            if future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body:
+                    await self.respond(writer, 413, {'error': 'Request body too large'}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.route(method, target, headers, body)
+                close = version != 'HTTP/1.1' or headers.get('connection', '').lower() == 'close'
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, body):
+        """Return (status, payload) for a request"""
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'queued': self.queue.qsize(),
+                         'documents': self.pending_documents}
+        if url.path not in ('/humanize', '/humanize/docx'):
+            return 404, {'error': 'Not found'}
+        if method != 'POST':
+            return 405, {'error': 'Use POST'}
+
+        try:
+            if url.path == '/humanize/docx':
+                query = parse_qs(url.query)
+                preserve_runs = query.get('preserve_runs', ['0'])[0] in ('1', 'true')
+                return 200, (DOCX_TYPE, await self.humanize_document(body, preserve_runs))
+
+            if headers.get('content-type', '').startswith('application/json'):
+                request = json.loads(body)
+                if not isinstance(request, dict) or not isinstance(request.get('text'), str):
+                    return 400, {'error': 'Expected a JSON object with a "text" string'}
+                text = request['text']
+                budget_ms = request.get('budget_ms')
+                if budget_ms is not None and not isinstance(budget_ms, (int, float)):
+                    return 400, {'error': '"budget_ms" must be a number'}
+                budget = None if budget_ms is None else budget_ms / 1000
+                text, stages, skipped = await self.humanize(text, budget)
+                return 200, {'text': text, 'stages': stages, 'skipped': skipped}
+            text, _, _ = await self.humanize(body.decode('utf-8'))
+            return 200, ('text/plain; charset=utf-8', text.encode('utf-8'))
+        except ServiceBusy:
+            return 503, {'error': 'Server busy, retry shortly'}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def respond(self, writer, status, payload, close=False):
+        if isinstance(payload, dict):
+            content_type, data = 'application/json', json.dumps(payload).encode('utf-8')
+        else:
+            content_type, data = payload
+        head = [f"HTTP/1.1 {status} {REASONS[status]}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(data)}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        if close:
+            head.append("Connection: close")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+        await writer.drain()
+
+async def serve(host, port, **options):
+    service = HumanizerService(**options)
+    server = await service.start(host, port)
+    print(f"🌐 Humanizer service listening on http://{host}:{port} with {service.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(description="Serve the humanizer over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help="humanizer processes (default: one per CPU)")
+    parser.add_argument('--queue-size', type=int, default=256, help="queued texts before returning 503")
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port, workers=args.workers,
+                          queue_size=args.queue_size, batch_size=args.batch_size))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(serve_main(sys.argv[1:]))
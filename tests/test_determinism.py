@@ -0,0 +1,44 @@
+import contextlib
+import io
+
+import docx
+
+from main import ParagraphCache, UltimateTextHumanizer, humanize_paragraphs, process_word_document
+
+TEXTS = [
+    "Furthermore, it is important to note that we do not utilize this approach.",
+    "Additionally, you should remember that the system does not facilitate growth.",
+    "In conclusion, it is essential to leverage robust methodologies.",
+    "However, the team is able to streamline the workflow for every stakeholder.",
+    "Moreover, it is crucial that we do not overlook the comprehensive roadmap.",
+]
+
+def repeating_texts(count=40, every=10):
+    """Distinct paragraphs with TEXTS[0] repeated every few paragraphs"""
+    return [TEXTS[0] if index % every == 0 else f"{TEXTS[index % 4 + 1]} Item {index}."
+            for index in range(count)]
+
+def test_worker_count_does_not_change_seeded_paragraphs():
+    texts = repeating_texts()
+    sequential = humanize_paragraphs(UltimateTextHumanizer(), texts, seed=5,
+                                     cache=ParagraphCache(maxsize=5))
+    pooled = humanize_paragraphs(UltimateTextHumanizer(), texts, seed=5, workers=2,
+                                 cache=ParagraphCache(maxsize=5))
+    assert sequential == pooled
+    # Repeats reuse the first occurrence even after the cache evicted it
+    assert len({sequential[index] for index in range(0, len(texts), 10)}) == 1
+
+def test_worker_count_does_not_change_seeded_document(tmp_path):
+    input_path = tmp_path / 'input.docx'
+    document = docx.Document()
+    for text in repeating_texts():
+        document.add_paragraph(text)
+    document.save(input_path)
+
+    outputs = []
+    for workers in (None, 2, 3):
+        output_path = tmp_path / f'output-{workers}.docx'
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_word_document(str(input_path), str(output_path), workers=workers, seed=5)
+        outputs.append([p.text for p in docx.Document(output_path).paragraphs])
+    assert outputs[0] == outputs[1] == outputs[2]